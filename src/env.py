@@ -8,18 +8,90 @@ Behavior:
 - Looks for `.env` at the repository root (parent of `src/`).
 - Parses simple KEY=VALUE lines (supports optional quotes).
 - Ignores blank lines and comments starting with `#`.
+- Skips lines whose key contains characters outside `[A-Za-z0-9._-]`.
 - Does NOT override existing environment variables by default.
 """
 
 from __future__ import annotations
 
+from collections.abc import Iterator
+from functools import lru_cache
 from pathlib import Path
+import mmap
 import os
 
 
-def _repo_root() -> Path:
-    # This file lives in `src/`, so repo root is one level up.
-    return Path(__file__).resolve().parents[1]
+# Byte -> 1 if the byte may appear in a key, else 0. Used with bytes.translate()
+# so key validation runs in C instead of a per-character Python loop.
+_KEYCHAR = bytes(
+    1 if i < 128 and (chr(i).isalnum() or chr(i) in "._-") else 0 for i in range(256)
+)
+_QUOTES = b"\"'"
+_EXPORT = b"export "
+
+
+# This file lives in `src/`, so repo root is one level up. Computed once at
+# import with abspath/dirname, which is pure string work (no realpath()).
+_REPO_ROOT = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _repo_root(*, resolve_symlinks: bool = False) -> Path:
+    if resolve_symlinks:
+        return _resolved_repo_root()
+    return _REPO_ROOT
+
+
+@lru_cache(maxsize=1)
+def _resolved_repo_root() -> Path:
+    return _REPO_ROOT.resolve()
+
+
+@lru_cache(maxsize=1)
+def _default_env_path() -> Path:
+    return _repo_root() / ".env"
+
+
+def _iter_pairs(buf: bytes | mmap.mmap) -> Iterator[tuple[str, str]]:
+    """Yield (key, value) pairs from raw `.env` bytes in a single forward scan.
+
+    Lines are located with `find` on the whole buffer instead of materializing
+    a list of lines; only accepted keys/values are sliced and decoded. Plain
+    `KEY=value` lines take a fast path that validates the raw key once and
+    skips the comment/`export`/whitespace handling. `buf` may be a read-only
+    `mmap`, which supports the same find/index/slice API.
+    """
+
+    n = len(buf)
+    i = 0
+    while i < n:
+        eol = buf.find(b"\n", i)
+        if eol == -1:
+            eol = n
+        j, i = i, eol + 1
+
+        # Blank lines and most comments have no separator at all.
+        sep = buf.find(b"=", j, eol)
+        if sep == -1:
+            continue
+
+        key = buf[j:sep]
+        if not key or 0 in key.translate(_KEYCHAR):
+            # Slow path: indentation, spaces around '=', comments or `export`.
+            key = key.strip()
+            if key[:1] == b"#":
+                continue
+            # Support: export KEY=VALUE
+            if key[:7] == _EXPORT:
+                key = key[7:].lstrip()
+            if not key or 0 in key.translate(_KEYCHAR):
+                continue
+
+        value = buf[sep + 1 : eol].strip()
+        # Strip optional surrounding quotes
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in _QUOTES:
+            value = value[1:-1]
+
+        yield key.decode("utf-8"), value.decode("utf-8")
 
 
 def load_dotenv(path: str | os.PathLike | None = None, *, override: bool = False) -> bool:
@@ -33,36 +105,24 @@ def load_dotenv(path: str | os.PathLike | None = None, *, override: bool = False
         True if a file was found and parsed, False otherwise.
     """
 
-    env_path = Path(path) if path is not None else (_repo_root() / ".env")
+    env_path = Path(path) if path is not None else _default_env_path()
     if not env_path.exists() or not env_path.is_file():
         return False
 
-    for raw_line in env_path.read_text(encoding="utf-8").splitlines():
-        line = raw_line.strip()
-        if not line or line.startswith("#"):
-            continue
-
-        # Support: export KEY=VALUE
-        if line.startswith("export "):
-            line = line[len("export ") :].lstrip()
-
-        if "=" not in line:
-            continue
-
-        key, value = line.split("=", 1)
-        key = key.strip()
-        value = value.strip()
-
-        # Strip optional surrounding quotes
-        if (len(value) >= 2) and ((value[0] == value[-1]) and value[0] in ('"', "'")):
-            value = value[1:-1]
-
-        if not key:
-            continue
-
-        if (not override) and (key in os.environ):
-            continue
-
-        os.environ[key] = value
+    fd = os.open(env_path, os.O_RDONLY)
+    try:
+        # mmap cannot map an empty file; there is nothing to parse anyway.
+        if os.fstat(fd).st_size == 0:
+            return True
+
+        # Scan the mapping directly instead of copying the file into a str.
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as buf:
+            for key, value in _iter_pairs(buf):
+                if (not override) and (key in os.environ):
+                    continue
+
+                os.environ[key] = value
+    finally:
+        os.close(fd)
 
     return True
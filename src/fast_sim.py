@@ -0,0 +1,48 @@
+"""
+完美归纳的整数快速模拟
+
+全员都是完美逻辑学家（PerfectInductionPolicy）时，整个模拟只是一台整数状态机：
+每个红眼睛看到 (在场红眼数 - 1) 个红眼睛，每个蓝眼睛看到 (在场红眼数) 个，
+第 d 天看到 d-1 个红眼睛的人离开。这里直接在计数器和 int 数组上推进天数，
+不创建 Village / Villager 对象，也不写推理日志。
+"""
+
+from array import array
+
+
+def simulate_perfect(
+    num_red: int,
+    num_blue: int,
+    announce: bool,
+    max_days: int,
+) -> tuple[int, array]:
+    """
+    按 run_simulation 的天数循环推进完美归纳模拟
+
+    村民顺序与 create_village 一致：先 num_red 个红眼睛，再 num_blue 个蓝眼睛。
+
+    Args:
+        num_red: 红眼睛数量
+        num_blue: 蓝眼睛数量
+        announce: 是否进行了游客公开宣布
+        max_days: 最多模拟的天数
+
+    Returns:
+        (实际模拟的天数, 每个村民的离开日期数组；0 表示没有离开)
+    """
+    left_on_day = array("i", bytes(4 * (num_red + num_blue)))
+    active_red = num_red
+
+    for day in range(1, max_days + 1):
+        # 红眼睛看到 active_red - 1 个红眼睛，第 active_red 天离开；
+        # 蓝眼睛看到 active_red 个，要等到第 active_red + 1 天，而那时红眼睛已经走了
+        if announce and active_red and day == active_red:
+            for i in range(num_red):
+                left_on_day[i] = day
+            active_red = 0
+
+        # 与 run_simulation 相同：有红眼睛且已全部离开时停止
+        if active_red == 0 and num_red > 0:
+            return day, left_on_day
+
+    return max_days, left_on_day
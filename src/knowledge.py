@@ -8,10 +8,11 @@
 """
 
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class KnowledgeState:
     """知识状态：表示一个人对某个命题的知识层级"""
     
@@ -29,7 +30,7 @@ class KnowledgeState:
         return f"KnowledgeState(knows_p0={self.knows_p0}, level={self.knowledge_level}, observed={self.observed_red_eyes})"
 
 
-@dataclass
+@dataclass(slots=True)
 class CommonKnowledge:
     """
     公共知识模型
@@ -81,11 +82,11 @@ def calculate_max_knowledge_level(num_red_eyes: int, observer_sees: int) -> int:
     Returns:
         该观察者能确定的最大知识层级
     """
-    if observer_sees == 0:
-        return -1  # 如果看不到红眼睛，无法确定任何知识
-    return observer_sees - 1
+    # 看不到红眼睛时为 -1（无法确定任何知识），否则为 k-1；用 max 合并两种情况
+    return max(observer_sees - 1, -1)
 
 
+@lru_cache(maxsize=128)
 def build_nested_knowledge_string(level: int) -> str:
     """
     构建嵌套知识的字符串表示
@@ -99,7 +100,5 @@ def build_nested_knowledge_string(level: int) -> str:
     if level == 0:
         return base
     
-    result = base
-    for _ in range(level):
-        result = f"所有人都知道({result})"
-    return result
+    # 一次性拼接，避免循环中每层都复制整个字符串
+    return "所有人都知道(" * level + base + ")" * level
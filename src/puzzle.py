@@ -4,20 +4,52 @@
 实现村民的推理过程和离开规则
 """
 
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass, field
-from enum import Enum
+from enum import IntEnum
 from typing import Optional
 
-from .reasoning import PerfectInductionPolicy, ReasoningPolicy
+from .reasoning import (
+    LOG_REASONING,
+    PerfectInductionPolicy,
+    ReasoningPolicy,
+    _keeps_blue_eyed_in_place,
+)
 
 
-class EyeColor(Enum):
-    """眼睛颜色"""
-    RED = "红色"
-    BLUE = "蓝色"
+class EyeColor(IntEnum):
+    """眼睛颜色（整数枚举：比较走 int 快路径，也可直接当数组下标）
 
+    .value 是 0/1；原先的中文值改由 .label 提供，str() 和 EyeColor("红色") 照旧可用。
+    """
+    RED = 0
+    BLUE = 1
 
-@dataclass
+    @property
+    def label(self) -> str:
+        """中文名称，用于展示"""
+        return _EYE_LABELS[self]
+
+    def __str__(self) -> str:
+        return self.label
+
+    @classmethod
+    def _missing_(cls, value: object) -> "EyeColor | None":
+        # 兼容旧的按中文值构造：EyeColor("红色") is EyeColor.RED
+        if value in _EYE_LABELS:
+            return cls(_EYE_LABELS.index(value))
+        return None
+
+
+_EYE_LABELS = ("红色", "蓝色")
+
+
+def _count_active_red(villagers: Iterable['Villager']) -> int:
+    """统计仍在村里的红眼睛人数"""
+    return sum(1 for v in villagers if v.is_red and not v.has_left)
+
+
+@dataclass(slots=True)
 class Villager:
     """村民类"""
     
@@ -40,25 +72,41 @@ class Villager:
     # 推理日志
     reasoning_log: list[str] = field(default_factory=list)
 
+    # 是否记录推理日志；大规模模拟不看日志时关闭，可省去每天的字符串格式化
+    record_log: bool = LOG_REASONING
+
     # 可观察到的“群体行为”上下文（用于更真实的推理/社会行为模拟）
     # - 昨天离开的人数（全村公开可见）
     observed_left_yesterday: int = 0
     # - 累计离开的人数（全村公开可见）
     observed_left_total: int = 0
+
+    # 在所属村庄列式数组（VillageArrays）中的下标，由 Village 分配
+    idx: int = field(default=-1, init=False, repr=False, compare=False)
     
     def __post_init__(self):
         if self.name is None:
             self.name = f"村民{self.id}"
+
+    @property
+    def is_red(self) -> bool:
+        """是否红眼睛（每次按 eye_color 现算：IntEnum 比较足够快，改了眼睛颜色也不会过期）"""
+        return self.eye_color == EyeColor.RED
     
     def __repr__(self) -> str:
-        return f"{self.name}({self.eye_color.value}眼睛)"
+        return f"{self.name}({self.eye_color.label}眼睛)"
+
+    def reasoning_text(self, indent: str = "") -> str:
+        """把推理日志拼成一个字符串（每行加 indent 前缀），供一次性输出"""
+        return "\n".join([indent + line for line in self.reasoning_log])
     
     def observe(self, others: list['Villager']) -> None:
-        """观察其他村民，统计看到的红眼睛数量"""
-        self.observed_red_eyes = sum(
-            1 for v in others 
-            if v.id != self.id and v.eye_color == EyeColor.RED and not v.has_left
-        )
+        """观察其他村民，统计看到的红眼睛数量
+
+        单个村民的兼容接口；村庄内批量更新请用 Village.refresh_observations()，
+        它只扫描一遍村民列表。
+        """
+        self.observed_red_eyes = _count_active_red(v for v in others if v.id != self.id)
     
     def reason_and_decide(self, day: int, public_announcement_made: bool) -> bool:
         """
@@ -89,18 +137,20 @@ class Villager:
             return False
         
         if not public_announcement_made:
-            self.reasoning_log.append(
-                f"第{day}天: 没有公开宣布。我仍会尝试推理，但缺少‘至少一人红眼’的公共知识基准，"
-                f"归纳链条无法闭合，所以无法确定自己是否该离开"
-            )
+            if self.record_log:
+                self.reasoning_log.append(
+                    f"第{day}天: 没有公开宣布。我仍会尝试推理，但缺少‘至少一人红眼’的公共知识基准，"
+                    f"归纳链条无法闭合，所以无法确定自己是否该离开"
+                )
             return False
         
-        if self.eye_color == EyeColor.BLUE:
+        if not self.is_red:
             # 蓝眼睛的推理
-            self.reasoning_log.append(
-                f"第{day}天: 我看到 {self.observed_red_eyes} 个红眼睛，"
-                f"我不是红眼睛，所以不需要离开"
-            )
+            if self.record_log:
+                self.reasoning_log.append(
+                    f"第{day}天: 我看到 {self.observed_red_eyes} 个红眼睛，"
+                    f"我不是红眼睛，所以不需要离开"
+                )
             return False
         
         # 红眼睛的推理过程
@@ -109,10 +159,11 @@ class Villager:
         if self.observed_red_eyes == 0:
             # 归纳基础：n=1 的情况（唯一直接从规则推出的）
             if day == 1:
-                self.reasoning_log.append(
-                    f"第{day}天: [归纳基础] 我看到 0 个红眼睛，但游客说至少有一个，"
-                    f"所以我一定是红眼睛！我必须离开。"
-                )
+                if self.record_log:
+                    self.reasoning_log.append(
+                        f"第{day}天: [归纳基础] 我看到 0 个红眼睛，但游客说至少有一个，"
+                        f"所以我一定是红眼睛！我必须离开。"
+                    )
                 return True
         else:
             # 归纳步骤：n=k+1 的情况
@@ -123,31 +174,76 @@ class Villager:
             my_leave_day = k + 1  # 如果第 k 天没人离开，说明我也是红眼睛
             
             if day < my_leave_day:
-                self.reasoning_log.append(
-                    f"第{day}天: [归纳推理] 我看到 {k} 个红眼睛。"
-                    f"假设我是蓝眼睛，那就只有 {k} 个红眼睛。"
-                    f"根据归纳假设，{k} 个红眼睛会在第 {k} 天离开。"
-                    f"现在才第 {day} 天，我继续等待观察..."
-                )
+                if self.record_log:
+                    self.reasoning_log.append(
+                        f"第{day}天: [归纳推理] 我看到 {k} 个红眼睛。"
+                        f"假设我是蓝眼睛，那就只有 {k} 个红眼睛。"
+                        f"根据归纳假设，{k} 个红眼睛会在第 {k} 天离开。"
+                        f"现在才第 {day} 天，我继续等待观察..."
+                    )
                 return False
             elif day == my_leave_day:
-                self.reasoning_log.append(
-                    f"第{day}天: [归纳推理完成] 我看到的 {k} 个红眼睛昨天没有离开！"
-                    f"如果只有他们 {k} 个是红眼睛，根据归纳假设他们应该在第 {k} 天离开。"
-                    f"他们没离开，说明我的假设'我是蓝眼睛'错误！"
-                    f"唯一的可能是：我也是红眼睛！我必须离开。"
-                )
+                if self.record_log:
+                    self.reasoning_log.append(
+                        f"第{day}天: [归纳推理完成] 我看到的 {k} 个红眼睛昨天没有离开！"
+                        f"如果只有他们 {k} 个是红眼睛，根据归纳假设他们应该在第 {k} 天离开。"
+                        f"他们没离开，说明我的假设'我是蓝眼睛'错误！"
+                        f"唯一的可能是：我也是红眼睛！我必须离开。"
+                    )
                 return True
         
         return False
     
-    def leave(self, day: int) -> None:
-        """离开村庄"""
+    def _leave(self, day: int) -> None:
+        """离开村庄（只能经由 Village.record_leave 调用，以便同步村庄的计数器和列式数组）"""
         self.has_left = True
         self.left_on_day = day
 
 
-@dataclass
+def iter_bits(mask: int) -> Iterator[int]:
+    """按从低到高的顺序产出位集中为 1 的位下标"""
+    bits = bin(mask)[:1:-1]  # 反转后第 i 个字符对应第 i 位
+    i = bits.find("1")
+    while i != -1:
+        yield i
+        i = bits.find("1", i + 1)
+
+
+@dataclass(slots=True)
+class VillageArrays:
+    """村庄的列式（SoA）视图
+
+    Villager 对象仍是对外 API；这里把热点循环需要的状态按列存放：
+    - 布尔列用 int 位集保存（第 i 位对应 villagers[i]），
+      统计和筛选都是 C 层面的整数运算（&、~、bit_count）
+    - 人数统计以 Village 的计数器为准，这里不再重复保存
+    """
+
+    size: int = 0
+    eye_red: int = 0
+    has_left: int = 0
+
+    def append(self, is_red: bool, has_left: bool = False) -> int:
+        """追加一个村民，返回其下标"""
+        idx = self.size
+        bit = 1 << idx
+        if is_red:
+            self.eye_red |= bit
+        if has_left:
+            self.has_left |= bit
+        self.size += 1
+        return idx
+
+    def mark_left(self, idx: int) -> None:
+        self.has_left |= 1 << idx
+
+    @property
+    def active(self) -> int:
+        """仍在村里的村民位集"""
+        return ((1 << self.size) - 1) & ~self.has_left
+
+
+@dataclass(slots=True)
 class Village:
     """村庄类"""
     
@@ -173,27 +269,86 @@ class Village:
 
     # 用于给村民提供“昨天离开人数”的可观察上下文
     left_yesterday_count: int = 0
+
+    # 增量计数器：由 add_villager / record_leave 维护，避免每次统计都扫描 villagers
+    _red_total: int = field(default=0, init=False, repr=False)
+    _blue_total: int = field(default=0, init=False, repr=False)
+    _left_total: int = field(default=0, init=False, repr=False)
+    _active_red: int = field(default=0, init=False, repr=False)
+    _active_blue: int = field(default=0, init=False, repr=False)
+
+    # 列式状态，与 villagers 一一对应（见 VillageArrays）
+    arrays: VillageArrays = field(default_factory=VillageArrays, init=False, repr=False)
+
+    def __post_init__(self):
+        # 兼容直接传入 villagers 列表的构造方式
+        for villager in self.villagers:
+            self._count_villager(villager)
+
+    def _count_villager(self, villager: Villager) -> None:
+        villager.idx = self.arrays.append(villager.is_red, villager.has_left)
+        if villager.is_red:
+            self._red_total += 1
+            if not villager.has_left:
+                self._active_red += 1
+        else:
+            self._blue_total += 1
+            if not villager.has_left:
+                self._active_blue += 1
+        if villager.has_left:
+            self._left_total += 1
     
     def add_villager(
         self,
-        eye_color: EyeColor,
+        eye_color: EyeColor | Villager,
         name: Optional[str] = None,
         villager_type: str = "dummy",
+        record_log: bool = LOG_REASONING,
     ) -> Villager:
-        """添加村民"""
-        villager = Villager(
-            id=len(self.villagers) + 1,
-            eye_color=eye_color,
-            name=name,
-            villager_type=villager_type,
-        )
+        """添加村民
+
+        既可以传眼睛颜色新建村民，也可以传入一个已构造好的 Villager；
+        村民必须经由这里（或构造函数）加入，才会登记到计数器和列式数组中。
+        """
+        if isinstance(eye_color, Villager):
+            villager = eye_color
+            if villager.idx >= 0:
+                raise ValueError(f"{villager!r} 已经登记在某个村庄中")
+        else:
+            villager = Villager(
+                id=len(self.villagers) + 1,
+                eye_color=eye_color,
+                name=name,
+                villager_type=villager_type,
+                record_log=record_log,
+            )
         self.villagers.append(villager)
+        self._count_villager(villager)
         return villager
     
+    def set_logging(self, enabled: bool) -> None:
+        """打开/关闭所有村民的推理日志"""
+        for villager in self.villagers:
+            villager.record_log = enabled
+
     def initialize_observations(self) -> None:
         """初始化所有村民的观察"""
-        for villager in self.villagers:
-            villager.observe(self.villagers)
+        self.refresh_observations()
+
+    def refresh_observations(self) -> None:
+        """更新所有在场村民看到的红眼睛数量
+
+        所有在场村民看到的是同一批人：在场红眼总数减去自己（若自己是红眼）。
+        因此只需统计一次总数，整体从 O(N²) 降为 O(N)；已离开的村民通过位集直接跳过。
+        """
+        arrays = self.arrays
+        active = arrays.active
+        red_active = self._active_red
+        villagers = self.villagers
+        for i in iter_bits(active & arrays.eye_red):
+            villagers[i].observed_red_eyes = red_active - 1
+        for i in iter_bits(active & ~arrays.eye_red):
+            villagers[i].observed_red_eyes = red_active
     
     def make_announcement(self) -> str:
         """
@@ -209,10 +364,12 @@ class Village:
         self.knowledge_level = -1
         
         message = "🎤 游客公开宣布: '村庄里至少有一个红眼睛的人！'"
-        self.daily_log.append(message)
-        self.daily_log.append("💡 关键变化: announcement_made = True")
-        self.daily_log.append("💡 关键变化: knowledge_level = -1 (公共知识，无限阶)")
-        self.daily_log.append("💡 关键变化: current_day 开始有意义的计时")
+        self.daily_log.extend((
+            message,
+            "💡 关键变化: announcement_made = True",
+            "💡 关键变化: knowledge_level = -1 (公共知识，无限阶)",
+            "💡 关键变化: current_day 开始有意义的计时",
+        ))
         return message
     
     def simulate_day(self) -> list[Villager]:
@@ -223,65 +380,113 @@ class Village:
             当天离开的村民列表
         """
         self.current_day += 1
-        self.daily_log.append(f"\n=== 第 {self.current_day} 天 ===")
-        
+        # 当天日志先收集到局部列表，最后一次性追加到 daily_log
+        day_log = [f"\n=== 第 {self.current_day} 天 ==="]
+
         # 更新观察（可能有人离开后情况变化）
-        for villager in self.villagers:
-            if not villager.has_left:
-                villager.observe(self.villagers)
+        self.refresh_observations()
+
+        # 只遍历仍在村里的村民：由 has_left 位集一次性得到
+        villagers = self.villagers
+        active = [villagers[i] for i in iter_bits(self.arrays.active)]
 
         # 更新可观察群体信息（昨日离开数/累计离开数）
-        total_left_now = sum(1 for v in self.villagers if v.has_left)
-        for villager in self.villagers:
-            if villager.has_left:
-                continue
+        total_left_now = self._left_total
+        for villager in active:
             villager.observed_left_yesterday = self.left_yesterday_count
             villager.observed_left_total = total_left_now
         
-        # 所有村民同时进行推理
-        leaving_today = []
-        for villager in self.villagers:
-            if not villager.has_left:
-                should_leave = self.reasoning_policy.decide(
-                    villager,
-                    self.current_day,
-                    self.announcement_made,
-                )
-                if should_leave:
-                    leaving_today.append(villager)
+        # 宣布后红眼睛已全部离开，且策略保证蓝眼睛不会离开、也没人要写推理日志：
+        # 当晚必然无人离开，不必逐个询问推理策略
+        if (
+            self.announcement_made
+            and self._active_red == 0
+            and not any(v.record_log for v in active)
+            and _keeps_blue_eyed_in_place(self.reasoning_policy)
+        ):
+            leaving_today = []
+        else:
+            # 所有村民同时进行推理
+            leaving_today = self._decide_leave_vectorized(self.current_day)
+        if leaving_today is None:
+            decisions = self._decide_each(active, self.current_day)
+            leaving_today = [v for v, should_leave in zip(active, decisions) if should_leave]
         
         # 记录离开的村民
         for villager in leaving_today:
-            villager.leave(self.current_day)
-            self.daily_log.append(f"  🚶 {villager} 离开了村庄")
+            self.record_leave(villager)
+            day_log.append(f"  🚶 {villager} 离开了村庄")
         
         if not leaving_today:
-            self.daily_log.append(f"  😴 今天没有人离开")
+            day_log.append(f"  😴 今天没有人离开")
+        self.daily_log.extend(day_log)
 
         # 为下一天准备“昨日离开人数”
         self.left_yesterday_count = len(leaving_today)
         
         return leaving_today
     
+    def _decide_leave_vectorized(self, day: int) -> Optional[list[Villager]]:
+        """整村一次性算出当晚离开的村民
+
+        仅当推理策略提供 decide_batch 且无人需要推理日志时可用（结论与逐个调用
+        策略一致，但不写日志）；否则返回 None，由调用方逐个调用 decide()。
+        """
+        decide_batch = getattr(self.reasoning_policy, "decide_batch", None)
+        if decide_batch is None or any(v.record_log for v in self.villagers):
+            return None
+        villagers = self.villagers
+        mask = decide_batch(villagers, self.arrays, day, self.announcement_made)
+        if mask is None:
+            return None
+        return [villagers[i] for i in iter_bits(mask)]
+
+    def _decide_each(self, active: list[Villager], day: int) -> list[bool]:
+        """逐个村民决策；策略提供 decide_many 时交给它一次处理（可并发）"""
+        policy = self.reasoning_policy
+        decide_many = getattr(policy, "decide_many", None)
+        if decide_many is not None:
+            return decide_many(active, day, self.announcement_made)
+        return [policy.decide(v, day, self.announcement_made) for v in active]
+
+    def record_leave(self, villager: Villager) -> None:
+        """让村民在当天离开，并同步更新计数器"""
+        if villager.has_left:
+            return
+        if villager.idx < 0:
+            raise ValueError(f"{villager!r} 没有登记在村庄中，请用 add_villager 加入")
+        villager._leave(self.current_day)
+        self.arrays.mark_left(villager.idx)
+        self._left_total += 1
+        if villager.is_red:
+            self._active_red -= 1
+        else:
+            self._active_blue -= 1
+    
     def get_remaining_villagers(self) -> list[Villager]:
         """获取还在村庄里的村民"""
+        if self._left_total == 0:
+            return list(self.villagers)
         return [v for v in self.villagers if not v.has_left]
     
     def get_red_eye_count(self) -> int:
         """获取红眼睛村民的总数"""
-        return sum(1 for v in self.villagers if v.eye_color == EyeColor.RED)
+        return self._red_total
     
     def get_blue_eye_count(self) -> int:
         """获取蓝眼睛村民的总数"""
-        return sum(1 for v in self.villagers if v.eye_color == EyeColor.BLUE)
+        return self._blue_total
+
+    def get_remaining_red_count(self) -> int:
+        """获取仍在村里的红眼睛人数"""
+        return self._active_red
     
     def print_status(self) -> str:
-        """打印当前状态"""
-        lines = [
+        """打印当前状态（所有数字都来自计数器，无需扫描村民）"""
+        return "\n".join((
             f"\n📊 村庄状态 (第{self.current_day}天)",
-            f"  红眼睛: {self.get_red_eye_count()} 人",
-            f"  蓝眼睛: {self.get_blue_eye_count()} 人",
-            f"  已离开: {sum(1 for v in self.villagers if v.has_left)} 人",
-            f"  剩余: {len(self.get_remaining_villagers())} 人",
-        ]
-        return "\n".join(lines)
+            f"  红眼睛: {self._red_total} 人",
+            f"  蓝眼睛: {self._blue_total} 人",
+            f"  已离开: {self._left_total} 人",
+            f"  剩余: {self._active_red + self._active_blue} 人",
+        ))
@@ -13,23 +13,41 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from hashlib import blake2b
 import json
+import logging
 import os
+import re
+import threading
 import time
-from random import Random
-from urllib.request import Request, urlopen
-from urllib.error import URLError, HTTPError
+from urllib.parse import urlsplit
 from typing import TYPE_CHECKING, Literal, Protocol
 
 from .env import load_dotenv
 
 if TYPE_CHECKING:  # pragma: no cover
-    from .puzzle import Villager
+    from collections.abc import Iterable
+    from concurrent.futures import ThreadPoolExecutor
+    from http.client import HTTPConnection
+
+    from .puzzle import Villager, VillageArrays
+
+_logger = logging.getLogger(__name__)
+
+# 全局推理日志开关：RBE_LOG=0 时新建村民默认不写 reasoning_log（跑批量/基准时省掉 f-string 格式化）
+LOG_REASONING = os.getenv("RBE_LOG", "1") != "0"
 
 
 def _is_blue(villager: "Villager") -> bool:
-    # Works for Enum (EyeColor.BLUE.name == 'BLUE') and is resilient to value changes.
+    # Villager exposes `is_red` (a cheap IntEnum comparison), so the hot path is
+    # one attribute read. Other villager-like objects fall back to the enum name,
+    # which works for Enum (EyeColor.BLUE.name == 'BLUE') and is resilient to
+    # value changes.
+    is_red = getattr(villager, "is_red", None)
+    if is_red is not None:
+        return not is_red
     return getattr(getattr(villager, "eye_color", None), "name", None) == "BLUE"
 
 
@@ -39,25 +57,38 @@ def _perfect_induction_decide_no_log(
     """Perfect induction decision without mutating villager.reasoning_log.
 
     This mirrors PerfectInductionPolicy.decide()'s decision logic, but avoids
-    writing logs so it can be used for enforcement/correction.
+    writing logs so it can be used for enforcement/correction. The base case
+    (see 0 red, leave on day 1) and the inductive step (see k, leave on day
+    k+1) are one expression; it short-circuits before any further attribute
+    reads (the eye-colour check comes last).
     """
 
-    if villager.has_left:
-        return False
+    return (
+        public_announcement_made
+        and not villager.has_left
+        and day == villager.observed_red_eyes + 1
+        and not _is_blue(villager)
+    )
 
-    if not public_announcement_made:
-        return False
 
-    if _is_blue(villager):
-        return False
+def _perfect_induction_leave_mask(
+    eye_red: int, active: int, day: int, public_announcement_made: bool
+) -> int:
+    """Whole-village perfect induction decision over bitsets.
 
-    # Red-eyes: base + inductive step
-    if villager.observed_red_eyes == 0:
-        return day == 1
+    Bit i of `eye_red` / `active` / the result refers to villagers[i] (see
+    VillageArrays). Every active red-eye sees the same k = red_active - 1
+    red-eyes, so the per-villager rule `day == k + 1` collapses into a single
+    comparison for the whole group; blue-eyes never leave.
+    """
 
-    k = villager.observed_red_eyes
-    my_leave_day = k + 1
-    return day == my_leave_day
+    if not public_announcement_made:
+        return 0
+
+    red_active = eye_red & active
+    if day != red_active.bit_count():
+        return 0
+    return red_active
 
 
 def _standard_proof_public_summary(
@@ -128,13 +159,23 @@ def _standard_proof_public_summary(
 
 
 class ReasoningPolicy(Protocol):
-    """推理策略接口"""
+    """推理策略接口
+
+    策略还可以（可选）实现整村批量决策：
+        decide_batch(villagers, arrays, day, public_announcement_made) -> int | None
+    返回当晚离开村民的位集（第 i 位对应 villagers[i]），不写推理日志；
+    返回 None 表示这一晚无法批量决策，由 Village 退回逐个调用 decide()。
+
+    以及（可选）一次决定多名村民：
+        decide_many(villagers, day, public_announcement_made) -> list[bool]
+    结果（含推理日志）须与逐个调用 decide() 相同，但实现可以并发执行（如网络请求）。
+    """
 
     def decide(self, villager: "Villager", day: int, public_announcement_made: bool) -> bool:
         """返回该村民当晚是否离开（并可写入 villager.reasoning_log）。"""
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PolicyByVillagerType:
     """按 villager.villager_type 路由到不同策略。
 
@@ -145,16 +186,62 @@ class PolicyByVillagerType:
 
     mapping: dict[str, ReasoningPolicy]
     default: ReasoningPolicy | None = None
+    _resolved: dict[str, ReasoningPolicy] = field(init=False, repr=False, compare=False)
+    _fallback: ReasoningPolicy = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # 构造时解析一次路由表，decide 里只剩一次 dict 查找
+        fallback = self.default if self.default is not None else _PERFECT
+        object.__setattr__(self, "_resolved", dict(self.mapping))
+        object.__setattr__(self, "_fallback", fallback)
 
     def decide(self, villager: "Villager", day: int, public_announcement_made: bool) -> bool:
-        villager_type = getattr(villager, "villager_type", None)
-        policy = self.mapping.get(str(villager_type), self.default)
-        if policy is None:
-            policy = PerfectInductionPolicy()
+        policy = self._resolved.get(villager.villager_type, self._fallback)
         return policy.decide(villager, day, public_announcement_made)
 
-
-@dataclass(frozen=True)
+    def decide_many(
+        self,
+        villagers: "list[Villager]",
+        day: int,
+        public_announcement_made: bool,
+    ) -> list[bool]:
+        """按类型分组；支持 decide_many 的策略（如 OpenAI）整组一次处理。"""
+        groups: dict[int, tuple[ReasoningPolicy, list[int]]] = {}
+        for i, villager in enumerate(villagers):
+            policy = self._resolved.get(villager.villager_type, self._fallback)
+            groups.setdefault(id(policy), (policy, []))[1].append(i)
+
+        decisions = [False] * len(villagers)
+        for policy, indices in groups.values():
+            group = [villagers[i] for i in indices]
+            decide_many = getattr(policy, "decide_many", None)
+            if decide_many is not None:
+                results = decide_many(group, day, public_announcement_made)
+            else:
+                results = [policy.decide(v, day, public_announcement_made) for v in group]
+            for i, leave in zip(indices, results):
+                decisions[i] = leave
+        return decisions
+
+    def decide_batch(
+        self,
+        villagers: "list[Villager]",
+        arrays: "VillageArrays",
+        day: int,
+        public_announcement_made: bool,
+    ) -> int | None:
+        """全村同一类型时，把批量决策转交给该类型的策略。"""
+        types = {v.villager_type for v in villagers}
+        if len(types) != 1:
+            return None
+        policy = self._resolved.get(types.pop(), self._fallback)
+        decide_batch = getattr(policy, "decide_batch", None)
+        if decide_batch is None:
+            return None
+        return decide_batch(villagers, arrays, day, public_announcement_made)
+
+
+@dataclass(frozen=True, slots=True)
 class PerfectInductionPolicy:
     """完美逻辑学家：使用归纳链条推理（等价于当前实现的逻辑）。"""
 
@@ -163,26 +250,29 @@ class PerfectInductionPolicy:
             return False
 
         if not public_announcement_made:
-            villager.reasoning_log.append(
-                f"第{day}天: 没有公开宣布。我仍会尝试推理，但缺少‘至少一人红眼’的公共知识基准，"
-                f"归纳链条无法闭合，所以无法确定自己是否该离开"
-            )
+            if villager.record_log:
+                villager.reasoning_log.append(
+                    f"第{day}天: 没有公开宣布。我仍会尝试推理，但缺少‘至少一人红眼’的公共知识基准，"
+                    f"归纳链条无法闭合，所以无法确定自己是否该离开"
+                )
             return False
 
         if _is_blue(villager):
-            villager.reasoning_log.append(
-                f"第{day}天: 我看到 {villager.observed_red_eyes} 个红眼睛，"
-                f"我不是红眼睛，所以不需要离开"
-            )
+            if villager.record_log:
+                villager.reasoning_log.append(
+                    f"第{day}天: 我看到 {villager.observed_red_eyes} 个红眼睛，"
+                    f"我不是红眼睛，所以不需要离开"
+                )
             return False
 
         # 红眼睛：归纳基础 + 归纳步骤
         if villager.observed_red_eyes == 0:
             if day == 1:
-                villager.reasoning_log.append(
-                    f"第{day}天: [归纳基础] 我看到 0 个红眼睛，但游客说至少有一个，"
-                    f"所以我一定是红眼睛！我必须离开。"
-                )
+                if villager.record_log:
+                    villager.reasoning_log.append(
+                        f"第{day}天: [归纳基础] 我看到 0 个红眼睛，但游客说至少有一个，"
+                        f"所以我一定是红眼睛！我必须离开。"
+                    )
                 return True
             return False
 
@@ -190,27 +280,43 @@ class PerfectInductionPolicy:
         my_leave_day = k + 1
 
         if day < my_leave_day:
-            villager.reasoning_log.append(
-                f"第{day}天: [归纳推理] 我看到 {k} 个红眼睛。"
-                f"假设我是蓝眼睛，那就只有 {k} 个红眼睛。"
-                f"根据归纳链条，{k} 个红眼睛会在第 {k} 天离开。"
-                f"现在才第 {day} 天，我继续等待观察..."
-            )
+            if villager.record_log:
+                villager.reasoning_log.append(
+                    f"第{day}天: [归纳推理] 我看到 {k} 个红眼睛。"
+                    f"假设我是蓝眼睛，那就只有 {k} 个红眼睛。"
+                    f"根据归纳链条，{k} 个红眼睛会在第 {k} 天离开。"
+                    f"现在才第 {day} 天，我继续等待观察..."
+                )
             return False
 
         if day == my_leave_day:
-            villager.reasoning_log.append(
-                f"第{day}天: [归纳推理完成] 我看到的 {k} 个红眼睛昨天没有离开！"
-                f"如果只有他们 {k} 个是红眼睛，根据归纳链条他们应该在第 {k} 天离开。"
-                f"他们没离开，说明我的假设'我是蓝眼睛'错误！"
-                f"唯一的可能是：我也是红眼睛！我必须离开。"
-            )
+            if villager.record_log:
+                villager.reasoning_log.append(
+                    f"第{day}天: [归纳推理完成] 我看到的 {k} 个红眼睛昨天没有离开！"
+                    f"如果只有他们 {k} 个是红眼睛，根据归纳链条他们应该在第 {k} 天离开。"
+                    f"他们没离开，说明我的假设'我是蓝眼睛'错误！"
+                    f"唯一的可能是：我也是红眼睛！我必须离开。"
+                )
             return True
 
         return False
 
+    def decide_batch(
+        self,
+        villagers: "list[Villager]",
+        arrays: "VillageArrays",
+        day: int,
+        public_announcement_made: bool,
+    ) -> int | None:
+        """整村一次性决策（不写日志），结论与逐个调用 decide() 一致。"""
+        return _perfect_induction_leave_mask(arrays.eye_red, arrays.active, day, public_announcement_made)
+
+
+# PerfectInductionPolicy 无状态且不可变：全模块共用一个实例作为默认/兜底策略
+_PERFECT = PerfectInductionPolicy()
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class NoReasoningPolicy:
     """不够聪明：无法从观察+公共知识中推理出自己的眼睛颜色。"""
 
@@ -219,17 +325,19 @@ class NoReasoningPolicy:
             return False
 
         if not public_announcement_made:
-            villager.reasoning_log.append(f"第{day}天: 没有公开宣布，我也不会推理")
+            if villager.record_log:
+                villager.reasoning_log.append(f"第{day}天: 没有公开宣布，我也不会推理")
             return False
 
-        villager.reasoning_log.append(
-            f"第{day}天: 我看到 {villager.observed_red_eyes} 个红眼睛，但我推理能力不足，"
-            f"无法确定自己是否是红眼睛，所以不离开"
-        )
+        if villager.record_log:
+            villager.reasoning_log.append(
+                f"第{day}天: 我看到 {villager.observed_red_eyes} 个红眼睛，但我推理能力不足，"
+                f"无法确定自己是否是红眼睛，所以不离开"
+            )
         return False
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class BoundedInductionPolicy:
     """有限聪明：只能做有限深度的归纳推理。
 
@@ -249,61 +357,92 @@ class BoundedInductionPolicy:
     max_k: int
 
     def decide(self, villager: "Villager", day: int, public_announcement_made: bool) -> bool:
+        if not villager.record_log:
+            # 不写日志时整条分支链等价于：看到 k≤max_k 个红眼的红眼睛在第 k+1 天离开
+            k = villager.observed_red_eyes
+            return (
+                public_announcement_made
+                and not villager.has_left
+                and k <= self.max_k
+                and day == k + 1
+                and not _is_blue(villager)
+            )
+
         if villager.has_left:
             return False
 
         if not public_announcement_made:
-            villager.reasoning_log.append(
-                f"第{day}天: 没有公开宣布。我仍会尝试推理，但缺少‘至少一人红眼’的公共知识基准，"
-                f"归纳链条无法闭合，所以无法确定自己是否该离开"
-            )
+            if villager.record_log:
+                villager.reasoning_log.append(
+                    f"第{day}天: 没有公开宣布。我仍会尝试推理，但缺少‘至少一人红眼’的公共知识基准，"
+                    f"归纳链条无法闭合，所以无法确定自己是否该离开"
+                )
             return False
 
         if _is_blue(villager):
-            villager.reasoning_log.append(
-                f"第{day}天: 我看到 {villager.observed_red_eyes} 个红眼睛，"
-                f"我不是红眼睛，所以不需要离开"
-            )
+            if villager.record_log:
+                villager.reasoning_log.append(
+                    f"第{day}天: 我看到 {villager.observed_red_eyes} 个红眼睛，"
+                    f"我不是红眼睛，所以不需要离开"
+                )
             return False
 
         if villager.observed_red_eyes == 0:
             # n=1 的基础情况
             if day == 1 and self.max_k >= 0:
+                if villager.record_log:
+                    villager.reasoning_log.append(
+                        f"第{day}天: [有限归纳] 我看到0个红眼睛，游客说至少有一个 → 我是红眼睛，离开"
+                    )
+                return True
+            if villager.record_log:
                 villager.reasoning_log.append(
-                    f"第{day}天: [有限归纳] 我看到0个红眼睛，游客说至少有一个 → 我是红眼睛，离开"
+                    f"第{day}天: [有限归纳] 我看到0个红眼睛，但我无法把结论落实到行动"
                 )
-                return True
-            villager.reasoning_log.append(
-                f"第{day}天: [有限归纳] 我看到0个红眼睛，但我无法把结论落实到行动"
-            )
             return False
 
         k = villager.observed_red_eyes
         if k > self.max_k:
-            villager.reasoning_log.append(
-                f"第{day}天: [有限归纳] 我看到{k}个红眼睛，但我只能处理到 k≤{self.max_k} 的归纳链条，"
-                f"无法得出结论，所以不离开"
-            )
+            if villager.record_log:
+                villager.reasoning_log.append(
+                    f"第{day}天: [有限归纳] 我看到{k}个红眼睛，但我只能处理到 k≤{self.max_k} 的归纳链条，"
+                    f"无法得出结论，所以不离开"
+                )
             return False
 
         # k 在能力范围内：按完美归纳执行
         my_leave_day = k + 1
         if day < my_leave_day:
-            villager.reasoning_log.append(
-                f"第{day}天: [有限归纳] 我看到{k}个红眼睛，且我能处理到 k≤{self.max_k}，继续等待"
-            )
+            if villager.record_log:
+                villager.reasoning_log.append(
+                    f"第{day}天: [有限归纳] 我看到{k}个红眼睛，且我能处理到 k≤{self.max_k}，继续等待"
+                )
             return False
 
         if day == my_leave_day:
-            villager.reasoning_log.append(
-                f"第{day}天: [有限归纳完成] 第{k}天无人离开 → 我也是红眼睛，离开"
-            )
+            if villager.record_log:
+                villager.reasoning_log.append(
+                    f"第{day}天: [有限归纳完成] 第{k}天无人离开 → 我也是红眼睛，离开"
+                )
             return True
 
         return False
 
-
-@dataclass(frozen=True)
+    def decide_batch(
+        self,
+        villagers: "list[Villager]",
+        arrays: "VillageArrays",
+        day: int,
+        public_announcement_made: bool,
+    ) -> int | None:
+        mask = _perfect_induction_leave_mask(arrays.eye_red, arrays.active, day, public_announcement_made)
+        # 每个在场红眼睛看到的红眼数都是 n-1：超出 max_k 时整批都推不出来
+        if mask and mask.bit_count() - 1 > self.max_k:
+            return 0
+        return mask
+
+
+@dataclass(frozen=True, slots=True)
 class MaxDayReasoningPolicy:
     """只能推理到某一天：超过该天数后就无法继续推理。
 
@@ -315,22 +454,41 @@ class MaxDayReasoningPolicy:
     """
 
     max_day: int
-    inner: ReasoningPolicy = PerfectInductionPolicy()
+    inner: ReasoningPolicy = _PERFECT
 
     def decide(self, villager: "Villager", day: int, public_announcement_made: bool) -> bool:
         if villager.has_left:
             return False
 
         if day > self.max_day:
-            villager.reasoning_log.append(
-                f"第{day}天: [能力限制] 我只能推理到第{self.max_day}天，无法继续推理，所以不离开"
-            )
+            if villager.record_log:
+                villager.reasoning_log.append(
+                    f"第{day}天: [能力限制] 我只能推理到第{self.max_day}天，无法继续推理，所以不离开"
+                )
             return False
 
         return self.inner.decide(villager, day, public_announcement_made)
 
 
-@dataclass(frozen=True)
+_MASK64 = (1 << 64) - 1
+_GOLDEN64 = 0x9E3779B97F4A7C15
+
+
+def _u01(seed: int, villager_id: int, day: int) -> float:
+    """Stateless uniform draw in [0, 1) keyed by (seed, villager_id, day).
+
+    Mixes the key with the SplitMix64 finalizer: a handful of integer ops,
+    instead of seeding a whole Mersenne Twister per draw.
+    """
+
+    x = (((seed * _GOLDEN64 + villager_id) & _MASK64) * _GOLDEN64 + day + _GOLDEN64) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    x ^= x >> 31
+    return (x >> 11) / (1 << 53)
+
+
+@dataclass(frozen=True, slots=True)
 class FalliblePolicy:
     """有概率犯错的推理者（用于测试：如果村民不总是完美逻辑学家会怎样）。
 
@@ -344,7 +502,34 @@ class FalliblePolicy:
 
     mistake_rate: float
     seed: int = 0
-    inner: ReasoningPolicy = PerfectInductionPolicy()
+    inner: ReasoningPolicy = _PERFECT
+    # primed() 预先算好的犯错位集：_mistakes[day-1] 的第 villager.id 位为 1 表示当天犯错；
+    # 只对 _primed_ids 里的村民有效，其余村民/天数仍现场抽随机数
+    _mistakes: tuple[int, ...] = field(default=(), init=False, repr=False, compare=False)
+    _primed_ids: int = field(default=0, init=False, repr=False, compare=False)
+
+    def primed(self, villagers: "Iterable[Villager]", n_days: int) -> "FalliblePolicy":
+        """返回一个为这些村民在第 1..n_days 天预抽好随机数的副本，之后的判断只剩一次位运算。
+
+        自身不被修改；副本与原策略相等，且判断结果完全相同（同一 seed/id/day 得到同一随机数）。
+        """
+        ids = [v.id for v in villagers if v.id >= 0]
+        rate = self.mistake_rate
+        seed = self.seed
+        mistakes = tuple(
+            sum(1 << vid for vid in ids if _u01(seed, vid, day) < rate) for day in range(1, n_days + 1)
+        )
+        policy = replace(self)
+        object.__setattr__(policy, "_mistakes", mistakes)
+        object.__setattr__(policy, "_primed_ids", sum(1 << vid for vid in set(ids)))
+        return policy
+
+    def _makes_mistake(self, villager: "Villager", day: int) -> bool:
+        # 可复现的伪随机：每个村民、每一天生成独立随机数
+        vid = villager.id
+        if 0 < day <= len(self._mistakes) and vid >= 0 and self._primed_ids >> vid & 1:
+            return bool(self._mistakes[day - 1] >> vid & 1)
+        return _u01(self.seed, vid, day) < self.mistake_rate
 
     def decide(self, villager: "Villager", day: int, public_announcement_made: bool) -> bool:
         if villager.has_left:
@@ -354,38 +539,138 @@ class FalliblePolicy:
         if not should_leave:
             return False
 
-        # 可复现的伪随机：每个村民、每一天生成独立随机数
-        rnd = Random(f"{self.seed}:{villager.id}:{day}").random()
-        if rnd < self.mistake_rate:
-            villager.reasoning_log.append(
-                f"第{day}天: [犯错] 我本应离开，但我犯错/不确定，选择留下"
-            )
+        if self._makes_mistake(villager, day):
+            if villager.record_log:
+                villager.reasoning_log.append(
+                    f"第{day}天: [犯错] 我本应离开，但我犯错/不确定，选择留下"
+                )
             return False
 
         return True
 
+    def decide_batch(
+        self,
+        villagers: "list[Villager]",
+        arrays: "VillageArrays",
+        day: int,
+        public_announcement_made: bool,
+    ) -> int | None:
+        """inner 能批量决策时，只对本该离开的村民抽随机数。"""
+        decide_batch = getattr(self.inner, "decide_batch", None)
+        if decide_batch is None:
+            return None
+        mask = decide_batch(villagers, arrays, day, public_announcement_made)
+        if not mask:
+            return mask
+        kept = mask
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            if self._makes_mistake(villagers[low.bit_length() - 1], day):
+                kept ^= low
+        return kept
+
+
+def _keeps_blue_eyed_in_place(policy: ReasoningPolicy) -> bool:
+    """策略是否保证蓝眼睛永远不离开（只有标准证明判定离开的红眼睛才可能离开）。
+
+    标准归纳及其“更弱”的变体（有限层数、有限天数、会漏走）都满足；
+    OpenAI 等其他策略可能让蓝眼睛离开，一律视为不满足。
+    """
+    if isinstance(policy, (PerfectInductionPolicy, BoundedInductionPolicy, NoReasoningPolicy)):
+        return True
+    if isinstance(policy, (MaxDayReasoningPolicy, FalliblePolicy)):
+        return _keeps_blue_eyed_in_place(policy.inner)
+    if isinstance(policy, PolicyByVillagerType):
+        return _keeps_blue_eyed_in_place(policy._fallback) and all(
+            _keeps_blue_eyed_in_place(p) for p in policy._resolved.values()
+        )
+    return False
+
+
+_JSON_DECODER = json.JSONDecoder()
+
 
 def _extract_first_json_object(text: str) -> dict:
-    """尽力从模型输出中提取第一个 JSON object。"""
-    text = text.strip()
-    try:
-        obj = json.loads(text)
-        if isinstance(obj, dict):
-            return obj
-    except json.JSONDecodeError:
-        pass
+    """尽力从模型输出中提取第一个 JSON object。
 
+    从每个 "{" 处用 raw_decode 解析一次：完整对象之后的多余文字直接忽略，
+    不必先整体解析失败再截取重试。
+    """
     start = text.find("{")
-    end = text.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        snippet = text[start : end + 1]
-        obj = json.loads(snippet)
-        if isinstance(obj, dict):
-            return obj
+    while start != -1:
+        try:
+            obj, _ = _JSON_DECODER.raw_decode(text, start)
+        except json.JSONDecodeError:
+            pass
+        else:
+            if isinstance(obj, dict):
+                return obj
+        start = text.find("{", start + 1)
 
     raise ValueError("Model output is not valid JSON object")
 
 
+# Phrase vocabularies for _reason_implies_certain_red_eye().
+# Negative certainty / hedges
+_NEG = (
+    "不确定",
+    "无法确定",
+    "不能确定",
+    "没法确定",
+    "未能确定",
+    "不能确认",
+    "无法确认",
+    "不敢确定",
+    "无法断定",
+)
+# Explicitly deny red-eye (must never force-leave)
+_DENY = (
+    "不是红眼",
+    "不是红眼睛",
+    "我不是红眼",
+    "我不是红眼睛",
+    "不认为自己是红眼",
+    "不认为自己是红眼睛",
+    "我不认为自己是红眼",
+    "我不认为自己是红眼睛",
+    "确定自己不是红眼",
+    "确定自己不是红眼睛",
+    "我确定自己不是红眼",
+    "我确定自己不是红眼睛",
+)
+# Explicit positive statement that *self* is red-eyed
+_POS = (
+    "我是红眼",
+    "我是红眼睛",
+    "我也是红眼",
+    "我也是红眼睛",
+    "自己是红眼",
+    "自己是红眼睛",
+)
+# Explicit certainty marker
+_CERT = ("我确定", "能确定", "可以确定", "我能确定", "我已确定")
+
+
+def _compile_phrases(phrases: tuple[str, ...]) -> re.Pattern[str]:
+    # One alternation per vocabulary: a single C-level scan finds any phrase,
+    # instead of one substring search per phrase. A phrase that contains another
+    # phrase of the same vocabulary can never be the only match ("不是红眼睛"
+    # always matches "不是红眼" too), so drop it to keep the alternation short.
+    phrases = tuple(dict.fromkeys(phrases))
+    minimal = [p for p in phrases if not any(q != p and q in p for q in phrases)]
+    return re.compile("|".join(map(re.escape, minimal)))
+
+
+# Hedges and denials both veto forcing, so they share one pattern (one scan).
+_REJECT_RE = _compile_phrases(_NEG + _DENY)
+_POS_RE = _compile_phrases(_POS)
+_CERT_RE = _compile_phrases(_CERT)
+
+
+# Pure function of the text, and models repeat the same canned reasons across
+# villagers and days, so repeats become a dict lookup.
+@lru_cache(maxsize=1024)
 def _reason_implies_certain_red_eye(reason: str) -> bool:
     """Heuristic: detect when the model claims certainty that it is red-eyed.
 
@@ -397,54 +682,13 @@ def _reason_implies_certain_red_eye(reason: str) -> bool:
     if not r:
         return False
 
-    # Negative certainty / hedges
-    neg_phrases = (
-        "不确定",
-        "无法确定",
-        "不能确定",
-        "没法确定",
-        "未能确定",
-        "不能确认",
-        "无法确认",
-        "不敢确定",
-        "无法断定",
-    )
-    if any(p in r for p in neg_phrases):
+    if _REJECT_RE.search(r):
         return False
 
-    # Explicitly deny red-eye (must never force-leave)
-    deny_red_phrases = (
-        "不是红眼",
-        "不是红眼睛",
-        "我不是红眼",
-        "我不是红眼睛",
-        "不认为自己是红眼",
-        "不认为自己是红眼睛",
-        "我不认为自己是红眼",
-        "我不认为自己是红眼睛",
-        "确定自己不是红眼",
-        "确定自己不是红眼睛",
-        "我确定自己不是红眼",
-        "我确定自己不是红眼睛",
-    )
-    if any(p in r for p in deny_red_phrases):
+    if not _POS_RE.search(r):
         return False
 
-    # Require explicit positive statement that *self* is red-eyed
-    positive_red_phrases = (
-        "我是红眼",
-        "我是红眼睛",
-        "我也是红眼",
-        "我也是红眼睛",
-        "自己是红眼",
-        "自己是红眼睛",
-    )
-    if not any(p in r for p in positive_red_phrases):
-        return False
-
-    # Require explicit certainty marker
-    certainty_markers = ("我确定", "能确定", "可以确定", "我能确定", "我已确定")
-    if not any(m in r for m in certainty_markers):
+    if not _CERT_RE.search(r):
         return False
 
     return True
@@ -463,15 +707,97 @@ def _should_force_leave(
         (final_leave, forced)
     """
 
-    if confidence_red is not None:
-        if (confidence_red >= threshold) and (not leave):
-            return True, True
-        return leave, False
+    # Nothing to force when the villager already leaves; confidence_red decides
+    # when present, and the reason text is only scanned for models that omit it.
+    forced = not leave and (
+        confidence_red >= threshold
+        if confidence_red is not None
+        else _reason_implies_certain_red_eye(reason)
+    )
+    return leave or forced, forced
+
+
+# Keep-alive connections, one per (scheme, host) per thread, reused across
+# attempts and across villagers so the TCP/TLS handshake is paid once.
+# http.client, sqlite3 and concurrent.futures are imported where they are used:
+# only OpenAI villagers need them, so offline simulations and tests skip them.
+_HTTP_LOCAL = threading.local()
+
+
+def _http_connection(scheme: str, netloc: str, timeout_s: float) -> HTTPConnection:
+    from http.client import HTTPConnection, HTTPSConnection
+
+    conns: dict[tuple[str, str], HTTPConnection] | None = getattr(_HTTP_LOCAL, "conns", None)
+    if conns is None:
+        conns = _HTTP_LOCAL.conns = {}
+    conn = conns.get((scheme, netloc))
+    if conn is None:
+        cls = HTTPSConnection if scheme == "https" else HTTPConnection
+        conn = conns[(scheme, netloc)] = cls(netloc, timeout=timeout_s)
+    conn.timeout = timeout_s
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout_s)
+    return conn
+
+
+def _drop_http_connection(scheme: str, netloc: str) -> None:
+    conn = getattr(_HTTP_LOCAL, "conns", {}).pop((scheme, netloc), None)
+    if conn is not None:
+        conn.close()
+
+
+def _post(url: str, body: bytes, headers: dict[str, str], timeout_s: float) -> tuple[int, bytes]:
+    """POST over a pooled keep-alive connection; returns (status, body)."""
+    from http.client import HTTPException
+
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    # An idle keep-alive socket may have been closed by the server; retry once
+    # on a fresh connection in that case. A failure on a connection opened for
+    # this request is never retried: the server may already have the (billed,
+    # non-idempotent) request.
+    while True:
+        conn = _http_connection(parts.scheme, parts.netloc, timeout_s)
+        reused = conn.sock is not None
+        try:
+            conn.request("POST", path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+        except (ConnectionError, HTTPException):
+            _drop_http_connection(parts.scheme, parts.netloc)
+            if not reused:
+                raise
+            continue
+        except OSError:
+            _drop_http_connection(parts.scheme, parts.netloc)
+            raise
+        if resp.will_close:
+            _drop_http_connection(parts.scheme, parts.netloc)
+        return resp.status, data
+
+
+# Compact separators and raw UTF-8 instead of \uXXXX escapes: the Chinese
+# prompts serialize to roughly half the bytes of json.dumps() defaults.
+_PAYLOAD_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _encode_payload(payload: dict) -> bytes:
+    return _PAYLOAD_ENCODER.encode(payload).encode("utf-8")
+
+
+# Some models/endpoints have evolved parameter names.
+# We try the newer `max_completion_tokens` first, then fall back to `max_tokens`.
+# We also try with response_format json_object, and fall back if unsupported.
+_ATTEMPT_COMBOS: tuple[tuple[str, bool], ...] = tuple(
+    (token_key, include_response_format)
+    for token_key in ("max_completion_tokens", "max_tokens")
+    for include_response_format in (True, False)
+)
 
-    # Fallback for models that don't provide confidence_red
-    if _reason_implies_certain_red_eye(reason) and (not leave):
-        return True, True
-    return leave, False
+# (base_url, model) -> the (token_key, include_response_format) that last succeeded
+_PROVIDER_PREF: dict[tuple[str, str], tuple[str, bool]] = {}
 
 
 def _openai_chat_completions(
@@ -484,6 +810,8 @@ def _openai_chat_completions(
     max_tokens: int,
     timeout_s: float,
 ) -> str:
+    from http.client import HTTPException
+
     normalized = base_url.rstrip("/")
     # Some providers (or user config) include '/v1' in base_url already.
     # Support both forms:
@@ -499,42 +827,44 @@ def _openai_chat_completions(
         "temperature": temperature,
     }
 
-    # Some models/endpoints have evolved parameter names.
-    # We try the newer `max_completion_tokens` first, then fall back to `max_tokens`.
-    # We also try with response_format json_object, and fall back if unsupported.
-    attempts: list[dict] = []
-    for token_key in ("max_completion_tokens", "max_tokens"):
-        for include_response_format in (True, False):
-            payload = dict(base_payload)
-            payload[token_key] = max_tokens
-            if include_response_format:
-                payload["response_format"] = {"type": "json_object"}
-            attempts.append(payload)
-
+    # Once a (base_url, model) has accepted a combination, try it first so
+    # later villagers skip the round-trips that are known to fail.
+    provider = (normalized, model)
+    preferred = _PROVIDER_PREF.get(provider)
+    attempts = _ATTEMPT_COMBOS
+    if preferred is not None:
+        attempts = (preferred,) + tuple(c for c in _ATTEMPT_COMBOS if c != preferred)
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
     last_error: Exception | None = None
-    for payload in attempts:
-        req = Request(
-            url,
-            data=json.dumps(payload).encode("utf-8"),
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            },
-            method="POST",
-        )
-
+    for combo in attempts:
+        token_key, include_response_format = combo
+        payload = dict(base_payload)
+        payload[token_key] = max_tokens
+        if include_response_format:
+            payload["response_format"] = {"type": "json_object"}
         try:
-            with urlopen(req, timeout=timeout_s) as resp:
-                data = json.loads(resp.read().decode("utf-8"))
-            last_error = None
-            break
-        except HTTPError as e:
-            detail = e.read().decode("utf-8", errors="ignore") if hasattr(e, "read") else str(e)
-            last_error = RuntimeError(f"Chat Completions API HTTPError: {e.code} {detail}")
+            status, body = _post(url, _encode_payload(payload), headers, timeout_s)
+        except TimeoutError:
+            # A hung provider stays hung whatever parameters we send.
+            raise
+        except ConnectionRefusedError as e:
+            last_error = RuntimeError(f"Chat Completions API connection error: {e!r}")
             continue
-        except URLError as e:
-            last_error = RuntimeError(f"Chat Completions API URLError: {e}")
+        except (OSError, HTTPException) as e:
+            raise RuntimeError(f"Chat Completions API connection error: {e!r}") from e
+        if status >= 400:
+            detail = body.decode("utf-8", errors="ignore")
+            last_error = RuntimeError(f"Chat Completions API HTTPError: {status} {detail}")
             continue
+        data = json.loads(body)
+        last_error = None
+        if combo != preferred:
+            _PROVIDER_PREF[provider] = combo
+        break
 
     if last_error is not None:
         raise last_error
@@ -545,7 +875,185 @@ def _openai_chat_completions(
         raise RuntimeError(f"Unexpected OpenAI response format: {data}") from e
 
 
-@dataclass(frozen=True)
+class _ResponseCache:
+    """模型回复的持久缓存：SQLite 文件 + 进程内字典，key 为请求内容的摘要。"""
+
+    def __init__(self, path: str) -> None:
+        import sqlite3
+
+        self._memo: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, content TEXT NOT NULL)")
+        self._db.commit()
+
+    @staticmethod
+    def key(*parts: object) -> str:
+        return blake2b("\x1f".join(map(str, parts)).encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            content = self._memo.get(key)
+            if content is None:
+                row = self._db.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    content = self._memo[key] = row[0]
+            return content
+
+    def set(self, key: str, content: str) -> None:
+        with self._lock:
+            self._memo[key] = content
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?)", (key, content))
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+@lru_cache(maxsize=None)
+def _response_cache(path: str) -> _ResponseCache:
+    return _ResponseCache(path)
+
+
+# 风格预设：更贴近“真实村民反应”，但可选对齐标准证明收敛行为
+_STYLE_DESC = {
+    "absolute_rational": (
+        "你是绝对理性、完美逻辑学家。"
+        "你会严格遵循公共知识与归纳链条推理，不会情绪化，不会随意改变规则解释。"
+    ),
+    "rational": "你是理性人：会尽力推理，但推理深度有限，遇到不确定会选择保守（更倾向留下）。",
+    "ordinary": "你是普通人：可能紧张、犹豫、误解信息；不保证能完成归纳链条。",
+    "social": (
+        "你是普通人且强烈受群体影响：会参考‘昨天是否有人离开’、‘已经有多少人离开’来决定。"
+        "你仍遵守规则：只有当你确定自己是红眼睛时才离开。"
+    ),
+}
+_FALLBACK_STYLE_DESC = "你是理性人。"
+
+
+def _style_temperature(style: str, temperature: float) -> float:
+    if style == "absolute_rational":
+        return 0.0
+    if style == "rational":
+        return min(temperature, 0.3)
+    if style in ("ordinary", "social"):
+        return max(temperature, 0.8)
+    return temperature  # pragma: no cover
+
+
+def _system_prompt(style_desc: str, alignment_on: bool) -> str:
+    system = (
+        "你在模拟一个村民的当晚决定。"
+        + style_desc
+        + "请不要输出逐步推理过程或内部思考链条，只给出可对外解释的简短理由与要点。"
+    )
+    if alignment_on:
+        system += (
+            "重要：本题采用标准红蓝眼谜题的强前提："
+            "(1) 所有人都是完美逻辑推理者；"
+            "(2) 这一点是公共知识；"
+            "(3) 每个人都严格遵守规则：当且仅当自己确定是红眼睛时，当晚离开。"
+            "你必须对齐标准归纳证明得到的行为（保证收敛）。"
+        )
+    return system
+
+
+# 提示词在导入时按 (style, alignment_on) 拼好，每次决策只填入几个数字
+_SYSTEM_PROMPTS = {
+    (style, alignment_on): _system_prompt(desc, alignment_on)
+    for style, desc in _STYLE_DESC.items()
+    for alignment_on in (False, True)
+}
+
+# 用户提示词里不变的部分在前、当天局面在最后：同一风格下所有村民、所有天的请求
+# 共享尽可能长的前缀，服务端的自动前缀缓存（prompt caching）可以复用这部分预填充。
+_USER_PROMPT_RULES = (
+    "谜题背景：村里每个人都能看到别人眼睛颜色但看不到自己。"
+    "所有人都遵守规则：一旦自己确定是红眼睛，就会在当晚离开村子。"
+    "每晚大家同时决定，第二天所有人都能看到谁离开了。\n\n"
+    '请输出严格 JSON：{{'
+    '"leave": true/false, '
+    '"confidence_red": 0.0~1.0, '
+    '"public_reason": string, '
+    '"key_points": [string, ...]'
+    '}}。'
+    "其中 confidence_red 表示你对‘自己是红眼睛’的确信程度（1.0=完全确定）。"
+    "public_reason 是一段给旁人听得懂的简短理由；key_points 给出 1-3 条要点（不要写逐步推导）。"
+)
+_USER_PROMPT_ALIGNMENT = (
+    "\n\n"
+    "对齐标准证明的提示（用于帮助你给出一致输出）："
+    "若游客已宣布，且你看到 k 个红眼睛："
+    "- 在第 1..k 天：你无法确定自己是红眼睛，因此 leave=false；"
+    "- 在第 k+1 天：如果之前无人离开，则你必须确定自己是红眼睛，因此 leave=true。"
+    "当 leave=true 时，confidence_red 必须接近 1.0。"
+)
+_USER_PROMPT_STATE = (
+    "今天是第 {day} 天。游客是否公开宣布‘至少有一个红眼睛’：{announcement}。\n"
+    "你能看到别人里红眼睛的数量：{observed}。\n"
+    "你看到昨天离开的人数：{left_yesterday}。\n"
+    "你看到累计离开的人数：{left_total}。"
+)
+_USER_PROMPTS = {
+    False: _USER_PROMPT_RULES + "\n\n" + _USER_PROMPT_STATE,
+    True: _USER_PROMPT_RULES + _USER_PROMPT_ALIGNMENT + "\n\n" + _USER_PROMPT_STATE,
+}
+# 合并请求（batch_size > 1）：同样的规则前缀，后面依次列出每位村民的局面，
+# 要求模型在一个 {"answers": [...]} 里按编号逐一作答。
+_BATCH_PROMPT_HEADS = {
+    False: _USER_PROMPT_RULES.format(),
+    True: (_USER_PROMPT_RULES + _USER_PROMPT_ALIGNMENT).format(),
+}
+_BATCH_PROMPT_INTRO = (
+    "\n\n"
+    "下面是 {n} 位村民各自的局面。他们彼此独立，每位只根据自己的局面作答（“你”指该村民）。"
+    '请输出严格 JSON：{{"answers": [...]}}，answers 按编号顺序、每位村民一个上面格式的对象。'
+)
+_BATCH_PROMPT_ITEM = "\n\n【村民 {index}】\n" + _USER_PROMPT_STATE
+
+
+@lru_cache(maxsize=1)
+def _load_dotenv_once() -> None:
+    # Load local `.env` (if present) so secrets can be configured without exporting.
+    # It never overrides variables that are already set, so once per process is enough.
+    load_dotenv()
+
+
+# 共享线程池：跨夜复用工作线程，也就复用了各线程里的 keep-alive 连接
+_OPENAI_MAX_WORKERS = 16
+_OPENAI_POOL: ThreadPoolExecutor | None = None
+_OPENAI_POOL_LOCK = threading.Lock()
+
+
+def _openai_pool() -> ThreadPoolExecutor:
+    global _OPENAI_POOL
+    with _OPENAI_POOL_LOCK:
+        if _OPENAI_POOL is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _OPENAI_POOL = ThreadPoolExecutor(
+                max_workers=_OPENAI_MAX_WORKERS, thread_name_prefix="openai"
+            )
+        return _OPENAI_POOL
+
+
+def _prompt_state(villager: "Villager", day: int, public_announcement_made: bool) -> dict[str, object]:
+    """填充 _USER_PROMPT_STATE 的字段（只读村民状态）。"""
+    return {
+        "day": day,
+        "announcement": "是" if public_announcement_made else "否",
+        "observed": getattr(villager, "observed_red_eyes", 0),
+        "left_yesterday": getattr(villager, "observed_left_yesterday", 0),
+        "left_total": getattr(villager, "observed_left_total", 0),
+    }
+
+
+# _conclude() 的“没有请求模型”回复：标准证明已经确定结论时使用
+_NO_REPLY: tuple[str | None, str | None] = (None, None)
+
+
+@dataclass(frozen=True, slots=True)
 class OpenAIReasoningPolicy:
     """使用 OpenAI 推理模型来模拟“更像真实人”的村民。
 
@@ -557,6 +1065,10 @@ class OpenAIReasoningPolicy:
     - 需要 API Key：优先读取 OPENAI_API_KEY，其次读取 SILICONFLOW_API_KEY
     - 可选模型：优先 OPENAI_MODEL，其次 SILICONFLOW_MODEL
     - 可选 base_url：优先 OPENAI_BASE_URL，其次 SILICONFLOW_BASE_URL
+    - 可选回复缓存：设置 OPENAI_CACHE_PATH（SQLite 文件路径）后，相同提示词直接复用
+      之前的回复，不再请求网络（温度 > 0 时也会固定为第一次的回复）
+    - 可选合并请求：batch_size > 1 时，decide_many() 把多位村民放进同一次请求，
+      模型在一个 answers 数组里逐一作答（回答数不符时退回逐个请求）
     """
 
     style: Literal["absolute_rational", "rational", "ordinary", "social"] = "rational"
@@ -567,13 +1079,66 @@ class OpenAIReasoningPolicy:
     timeout_s: float = 20.0
     certainty_threshold: float = 0.95
     align_to_standard_proof: bool = False
+    # decide_many() 每次请求最多合并回答的村民数；1 表示每位村民单独请求
+    batch_size: int = 1
 
     def decide(self, villager: "Villager", day: int, public_announcement_made: bool) -> bool:
         if villager.has_left:
             return False
-
-        # Load local `.env` (if present) so secrets can be configured without exporting.
-        load_dotenv()
+        if self._proof_decides(villager, day, public_announcement_made):
+            return self._conclude(villager, day, public_announcement_made, _NO_REPLY)
+        reply = self._consult(villager, day, public_announcement_made, self._credentials())
+        return self._conclude(villager, day, public_announcement_made, reply)
+
+    def decide_many(
+        self,
+        villagers: "list[Villager]",
+        day: int,
+        public_announcement_made: bool,
+    ) -> list[bool]:
+        """并发请求一晚所有村民的模型回复，结果与逐个调用 decide() 相同。
+
+        HTTP 等待会释放 GIL，所以用线程池把 N 次串行往返变成并发；
+        batch_size > 1 时每 batch_size 位村民合并成一次请求。
+        推理日志仍在调用线程里按村民顺序写入。
+        """
+        pending = [
+            v
+            for v in villagers
+            if not v.has_left and not self._proof_decides(v, day, public_announcement_made)
+        ]
+        replies: dict[int, tuple[str | None, str | None]] = {}
+        if pending:
+            credentials = self._credentials()
+            size = max(1, self.batch_size)
+            batches = [pending[i : i + size] for i in range(0, len(pending), size)]
+            batch_replies = _openai_pool().map(
+                lambda batch: self._consult_batch(batch, day, public_announcement_made, credentials),
+                batches,
+            )
+            replies = {
+                v.id: reply
+                for batch, answers in zip(batches, batch_replies)
+                for v, reply in zip(batch, answers)
+            }
+        return [
+            False
+            if v.has_left
+            else self._conclude(v, day, public_announcement_made, replies.get(v.id, _NO_REPLY))
+            for v in villagers
+        ]
+
+    def _proof_decides(self, villager: "Villager", day: int, public_announcement_made: bool) -> bool:
+        """对齐模式下标准证明判定“今晚离开”时，模型回复改变不了结论，不必请求。
+
+        （留下的夜晚仍要请求：模型若确信自己是红眼，强制规则可能让他离开。）
+        """
+        alignment_on = bool(self.align_to_standard_proof) or self.style == "absolute_rational"
+        return alignment_on and _perfect_induction_decide_no_log(villager, day, public_announcement_made)
+
+    def _credentials(self) -> tuple[str, str, str]:
+        """返回 (api_key, model, base_url)。"""
+        _load_dotenv_once()
 
         api_key = os.getenv("OPENAI_API_KEY") or os.getenv("SILICONFLOW_API_KEY")
         if not api_key:
@@ -584,98 +1149,98 @@ class OpenAIReasoningPolicy:
 
         model = self.model or os.getenv("OPENAI_MODEL") or os.getenv("SILICONFLOW_MODEL") or "Qwen/QwQ-32B"
         base_url = os.getenv("OPENAI_BASE_URL") or os.getenv("SILICONFLOW_BASE_URL") or self.base_url
-        announcement = "是" if public_announcement_made else "否"
-        observed = getattr(villager, "observed_red_eyes", 0)
-        left_yesterday = getattr(villager, "observed_left_yesterday", 0)
-        left_total = getattr(villager, "observed_left_total", 0)
-
-        # 风格预设：更贴近“真实村民反应”，但可选对齐标准证明收敛行为
-        style = self.style
-        if style == "absolute_rational":
-            style_desc = (
-                "你是绝对理性、完美逻辑学家。"
-                "你会严格遵循公共知识与归纳链条推理，不会情绪化，不会随意改变规则解释。"
-            )
-            temperature = 0.0
-        elif style == "rational":
-            style_desc = (
-                "你是理性人：会尽力推理，但推理深度有限，遇到不确定会选择保守（更倾向留下）。"
-            )
-            temperature = min(self.temperature, 0.3)
-        elif style == "ordinary":
-            style_desc = (
-                "你是普通人：可能紧张、犹豫、误解信息；不保证能完成归纳链条。"
-            )
-            temperature = max(self.temperature, 0.8)
-        elif style == "social":
-            style_desc = (
-                "你是普通人且强烈受群体影响：会参考‘昨天是否有人离开’、‘已经有多少人离开’来决定。"
-                "你仍遵守规则：只有当你确定自己是红眼睛时才离开。"
-            )
-            temperature = max(self.temperature, 0.8)
-        else:  # pragma: no cover
-            style_desc = "你是理性人。"
-            temperature = self.temperature
-
-        alignment_on = bool(self.align_to_standard_proof) or style == "absolute_rational"
-
-        expected_leave = (
-            _perfect_induction_decide_no_log(villager, day, public_announcement_made)
-            if alignment_on
-            else None
+        return api_key, model, base_url
+
+    def _consult(
+        self,
+        villager: "Villager",
+        day: int,
+        public_announcement_made: bool,
+        credentials: tuple[str, str, str],
+    ) -> tuple[str | None, str | None]:
+        """只读村民状态并请求模型，返回 (content, openai_error)；可在工作线程中调用。"""
+        alignment_on = bool(self.align_to_standard_proof) or self.style == "absolute_rational"
+        user = _USER_PROMPTS[alignment_on].format(
+            **_prompt_state(villager, day, public_announcement_made)
         )
-
-        system = (
-            "你在模拟一个村民的当晚决定。"
-            + style_desc
-            + "请不要输出逐步推理过程或内部思考链条，只给出可对外解释的简短理由与要点。"
-        )
-
-        if alignment_on:
-            system += (
-                "重要：本题采用标准红蓝眼谜题的强前提："
-                "(1) 所有人都是完美逻辑推理者；"
-                "(2) 这一点是公共知识；"
-                "(3) 每个人都严格遵守规则：当且仅当自己确定是红眼睛时，当晚离开。"
-                "你必须对齐标准归纳证明得到的行为（保证收敛）。"
-            )
-
-        user = (
-            "谜题背景：村里每个人都能看到别人眼睛颜色但看不到自己。"
-            "所有人都遵守规则：一旦自己确定是红眼睛，就会在当晚离开村子。"
-            "每晚大家同时决定，第二天所有人都能看到谁离开了。\n\n"
-            f"今天是第 {day} 天。游客是否公开宣布‘至少有一个红眼睛’：{announcement}。\n"
-            f"你能看到别人里红眼睛的数量：{observed}。\n"
-            f"你看到昨天离开的人数：{left_yesterday}。\n"
-            f"你看到累计离开的人数：{left_total}。\n"
-            "\n"
-            '请输出严格 JSON：{'
-            '"leave": true/false, '
-            '"confidence_red": 0.0~1.0, '
-            '"public_reason": string, '
-            '"key_points": [string, ...]'
-            '}。'
-            "其中 confidence_red 表示你对‘自己是红眼睛’的确信程度（1.0=完全确定）。"
-            "public_reason 是一段给旁人听得懂的简短理由；key_points 给出 1-3 条要点（不要写逐步推导）。"
+        who = getattr(villager, "name", villager.id)
+        return self._request(user, self.max_tokens, credentials, day, who)
+
+    def _consult_batch(
+        self,
+        villagers: "list[Villager]",
+        day: int,
+        public_announcement_made: bool,
+        credentials: tuple[str, str, str],
+    ) -> list[tuple[str | None, str | None]]:
+        """一次请求让模型按编号回答多位村民，拆回每人一份 (content, openai_error)。
+
+        模型回复了但没有给出与人数一致的 answers 时，退回逐个 _consult()；
+        请求本身失败（网络/超时）时不再逐个重试，每人都拿到同一个错误。
+        """
+        if len(villagers) == 1:
+            return [self._consult(villagers[0], day, public_announcement_made, credentials)]
+        alignment_on = bool(self.align_to_standard_proof) or self.style == "absolute_rational"
+        user = "".join(
+            [
+                _BATCH_PROMPT_HEADS[alignment_on],
+                _BATCH_PROMPT_INTRO.format(n=len(villagers)),
+                *(
+                    _BATCH_PROMPT_ITEM.format(index=i, **_prompt_state(v, day, public_announcement_made))
+                    for i, v in enumerate(villagers, start=1)
+                ),
+            ]
         )
-
-        if alignment_on:
-            user += (
-                "\n\n"
-                "对齐标准证明的提示（用于帮助你给出一致输出）："
-                "若游客已宣布，且你看到 k 个红眼睛："
-                "- 在第 1..k 天：你无法确定自己是红眼睛，因此 leave=false；"
-                "- 在第 k+1 天：如果之前无人离开，则你必须确定自己是红眼睛，因此 leave=true。"
-                "当 leave=true 时，confidence_red 必须接近 1.0。"
-            )
+        who = ",".join(str(getattr(v, "name", v.id)) for v in villagers)
+        content, openai_error = self._request(user, self.max_tokens * len(villagers), credentials, day, who)
+        if content is None:
+            return [(None, openai_error)] * len(villagers)
+        try:
+            answers = _extract_first_json_object(content).get("answers")
+        except ValueError:
+            answers = None
+        if (
+            isinstance(answers, list)
+            and len(answers) == len(villagers)
+            and all(isinstance(a, dict) for a in answers)
+        ):
+            return [(_PAYLOAD_ENCODER.encode(a), None) for a in answers]
+        return [self._consult(v, day, public_announcement_made, credentials) for v in villagers]
+
+    def _request(
+        self,
+        user: str,
+        max_tokens: int,
+        credentials: tuple[str, str, str],
+        day: int,
+        who: object,
+    ) -> tuple[str | None, str | None]:
+        """发送一条（系统提示词 + user）请求，经过可选的回复缓存。"""
+        api_key, model, base_url = credentials
+        style = self.style
+        alignment_on = bool(self.align_to_standard_proof) or style == "absolute_rational"
+        temperature = _style_temperature(style, self.temperature)
+        system = _SYSTEM_PROMPTS.get((style, alignment_on)) or _system_prompt(_FALLBACK_STYLE_DESC, alignment_on)
+
+        cache_path = os.getenv("OPENAI_CACHE_PATH")
+        cache = _response_cache(cache_path) if cache_path else None
+        cache_key = ""
+        if cache is not None:
+            cache_key = _ResponseCache.key(base_url, model, temperature, max_tokens, system, user)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached, None
 
         content: str | None = None
         openai_error: str | None = None
         try:
-            started = time.time()
-            print(
-                f"[OpenAI] start day={day} villager={getattr(villager, 'name', villager.id)} style={self.style} model={model}",
-                flush=True,
+            started = time.perf_counter()
+            _logger.debug(
+                "[OpenAI] start day=%d villager=%s style=%s model=%s",
+                day,
+                who,
+                self.style,
+                model,
             )
             content = _openai_chat_completions(
                 api_key=api_key,
@@ -686,16 +1251,36 @@ class OpenAIReasoningPolicy:
                     {"role": "user", "content": user},
                 ],
                 temperature=temperature,
-                max_tokens=self.max_tokens,
+                max_tokens=max_tokens,
                 timeout_s=self.timeout_s,
             )
-            elapsed_ms = int((time.time() - started) * 1000)
-            print(
-                f"[OpenAI] end   day={day} villager={getattr(villager, 'name', villager.id)} ({elapsed_ms}ms)",
-                flush=True,
+            if cache is not None:
+                cache.set(cache_key, content)
+            _logger.debug(
+                "[OpenAI] end   day=%d villager=%s (%dms)",
+                day,
+                who,
+                (time.perf_counter() - started) * 1000,
             )
         except Exception as e:
             openai_error = str(e)
+        return content, openai_error
+
+    def _conclude(
+        self,
+        villager: "Villager",
+        day: int,
+        public_announcement_made: bool,
+        reply: tuple[str | None, str | None],
+    ) -> bool:
+        """解析模型回复、对齐/强制规则并写推理日志；在调用线程中执行。"""
+        content, openai_error = reply
+        alignment_on = bool(self.align_to_standard_proof) or self.style == "absolute_rational"
+        expected_leave = (
+            _perfect_induction_decide_no_log(villager, day, public_announcement_made)
+            if alignment_on
+            else None
+        )
 
         leave: bool
         confidence_red: float | None
@@ -759,13 +1344,16 @@ class OpenAIReasoningPolicy:
         )
 
         conf_display = "?" if confidence_red is None else f"{confidence_red:.2f}"
+        skipped = reply is _NO_REPLY
 
         key_points_text = "" if not key_points else f"；要点: {' | '.join(key_points[:3])}"
         err_text = "" if not openai_error else f"；OpenAI错误: {openai_error}"
-        villager.reasoning_log.append(
-            f"第{day}天: [OpenAI] 决策={'离开' if leave else '留下'}"
-            f"{'（对齐标准证明）' if (expected_leave is not None) else ''}"
-            f"{'（强制：确信为红眼）' if forced else ''}"
-            f"；confidence_red={conf_display}；理由: {public_reason}{key_points_text}{err_text}"
-        )
+        if villager.record_log:
+            villager.reasoning_log.append(
+                f"第{day}天: [OpenAI] 决策={'离开' if leave else '留下'}"
+                f"{'（对齐标准证明）' if (expected_leave is not None) else ''}"
+                f"{'（标准证明已确定，未请求模型）' if skipped else ''}"
+                f"{'（强制：确信为红眼）' if forced else ''}"
+                f"；confidence_red={conf_display}；理由: {public_reason}{key_points_text}{err_text}"
+            )
         return leave
@@ -4,9 +4,13 @@
 运行完整的模拟过程，验证推理逻辑
 """
 
+import sys
+from itertools import repeat
+
 from .puzzle import Village, EyeColor, Villager
 from .knowledge import CommonKnowledge, build_nested_knowledge_string
 from .reasoning import PerfectInductionPolicy, ReasoningPolicy
+from .fast_sim import simulate_perfect
 
 
 def create_village(
@@ -31,19 +35,16 @@ def create_village(
     total = num_red + num_blue
     if villager_types is not None and len(villager_types) != total:
         raise ValueError(f"villager_types length must be {total}, got {len(villager_types)}")
-    idx = 0
+    # 在循环外一次性决定类型来源，循环里只取下一个
+    types = iter(villager_types) if villager_types is not None else repeat(villager_type)
     
     # 添加红眼睛村民
     for i in range(num_red):
-        t = villager_types[idx] if villager_types is not None else villager_type
-        village.add_villager(EyeColor.RED, name=f"红{i+1}", villager_type=t)
-        idx += 1
+        village.add_villager(EyeColor.RED, name=f"红{i+1}", villager_type=next(types))
     
     # 添加蓝眼睛村民
     for i in range(num_blue):
-        t = villager_types[idx] if villager_types is not None else villager_type
-        village.add_villager(EyeColor.BLUE, name=f"蓝{i+1}", villager_type=t)
-        idx += 1
+        village.add_villager(EyeColor.BLUE, name=f"蓝{i+1}", villager_type=next(types))
     
     # 初始化观察
     village.initialize_observations()
@@ -72,11 +73,24 @@ def run_simulation(
     Returns:
         模拟结果字典
     """
+    # 全员完美归纳且不需要输出过程：走整数快速路径，不创建村民对象
+    if not verbose and (reasoning_policy is None or type(reasoning_policy) is PerfectInductionPolicy):
+        if villager_types is not None and len(villager_types) != num_red + num_blue:
+            raise ValueError(
+                f"villager_types length must be {num_red + num_blue}, got {len(villager_types)}"
+            )
+        return _run_perfect_fast(num_red, num_blue, announce)
+
+    # 详细输出先攒在列表里，按阶段（开场、每天、结尾）一次性写出，
+    # 避免几千行 print 各自触发一次写入；按天写出也能让慢速（LLM）模拟看到进度
+    lines: list[str] = []
+    emit = lines.append
+
     if verbose:
-        print("=" * 60)
-        print("🏘️  红蓝眼谜题模拟器")
-        print("=" * 60)
-        print(f"\n设置: {num_red} 个红眼睛, {num_blue} 个蓝眼睛")
+        emit("=" * 60)
+        emit("🏘️  红蓝眼谜题模拟器")
+        emit("=" * 60)
+        emit(f"\n设置: {num_red} 个红眼睛, {num_blue} 个蓝眼睛")
     
     village = create_village(
         num_red,
@@ -88,49 +102,51 @@ def run_simulation(
     
     # 展示初始状态
     if verbose:
-        print("\n📋 初始状态:")
+        emit("\n📋 初始状态:")
         for v in village.villagers:
-            print(f"  {v} - 看到 {v.observed_red_eyes} 个红眼睛")
+            emit(f"  {v} - 看到 {v.observed_red_eyes} 个红眼睛")
     
     # 分析知识层级（宣布之前）
     if verbose:
-        print("\n" + "-" * 40)
-        print("📚 知识层级分析（宣布前）")
-        print("-" * 40)
+        emit("\n" + "-" * 40)
+        emit("📚 知识层级分析（宣布前）")
+        emit("-" * 40)
         
         knowledge = CommonKnowledge(proposition="村庄里存在红眼睛")
         
         if num_red >= 2:
             # 所有人都能看到红眼睛
-            print(f"  ✅ p₀ = '{knowledge.proposition}' 被所有人知道")
+            emit(f"  ✅ p₀ = '{knowledge.proposition}' 被所有人知道")
             max_level = num_red - 1
-            print(f"  📊 当前最大知识层级: {max_level} 阶")
-            print(f"     {build_nested_knowledge_string(max_level)}")
-            print(f"  ❌ 无法达到 {max_level + 1} 阶，因为红眼睛只能看到 {num_red - 1} 个红眼睛")
+            emit(f"  📊 当前最大知识层级: {max_level} 阶")
+            emit(f"     {build_nested_knowledge_string(max_level)}")
+            emit(f"  ❌ 无法达到 {max_level + 1} 阶，因为红眼睛只能看到 {num_red - 1} 个红眼睛")
         elif num_red == 1:
-            print(f"  ⚠️ p₀ 不被唯一的红眼睛知道（他看不到任何红眼睛）")
+            emit(f"  ⚠️ p₀ 不被唯一的红眼睛知道（他看不到任何红眼睛）")
         else:
-            print(f"  ❌ 没有红眼睛，p₀ 不成立")
+            emit(f"  ❌ 没有红眼睛，p₀ 不成立")
     
     # 游客宣布（可选）
     if announce:
         if verbose:
-            print("\n" + "-" * 40)
+            emit("\n" + "-" * 40)
         announcement = village.make_announcement()
         if verbose:
-            print(announcement)
-            print("-" * 40)
-            print("💡 公共知识形成: p₀ 瞬间达到无限阶!")
+            emit(announcement)
+            emit("-" * 40)
+            emit("💡 公共知识形成: p₀ 瞬间达到无限阶!")
     else:
         if verbose:
-            print("\n" + "-" * 40)
-            print(
+            emit("\n" + "-" * 40)
+            emit(
                 "🚫 无游客宣布：大家仍会思考，但缺少‘至少一人红眼’的公共知识基准，归纳链条无法闭合"
             )
-            print("-" * 40)
+            emit("-" * 40)
     
+    _flush_lines(lines)
+
     # 开始每日模拟
-    max_days = (num_red + 5) if announce else max(10, num_red + 10)  # 无宣布时用更显著的演示上限
+    max_days = _max_days(num_red, announce)
     results = {
         "num_red": num_red,
         "num_blue": num_blue,
@@ -150,16 +166,11 @@ def run_simulation(
         })
         
         if verbose:
-            for log_entry in village.daily_log[prev_log_len:]:
-                print(log_entry)
+            lines.extend(village.daily_log[prev_log_len:])
+            _flush_lines(lines)
         
-        # 检查是否所有红眼睛都离开了
-        remaining_red = sum(
-            1 for v in village.villagers 
-            if v.eye_color == EyeColor.RED and not v.has_left
-        )
-        
-        if remaining_red == 0 and num_red > 0:
+        # 检查是否所有红眼睛都离开了（计数器随离开同步更新，无需扫描村民）
+        if village.get_remaining_red_count() == 0 and num_red > 0:
             results["days_to_leave"] = day
             results["all_red_left"] = True
             results["left_villagers"] = [
@@ -170,9 +181,9 @@ def run_simulation(
     
     # 验证结果
     if verbose:
-        print("\n" + "=" * 60)
-        print("📊 结果")
-        print("=" * 60)
+        emit("\n" + "=" * 60)
+        emit("📊 结果")
+        emit("=" * 60)
         
         expected_day = num_red if num_red > 0 else 0
         actual_day = results["days_to_leave"]
@@ -181,40 +192,84 @@ def run_simulation(
         is_exploratory = any(getattr(v, "villager_type", "dummy") != "dummy" for v in village.villagers)
 
         if num_red == 0:
-            print("  ℹ️ 没有红眼睛，没有人需要离开")
-            print("  ✅ 验证通过!")
+            emit("  ℹ️ 没有红眼睛，没有人需要离开")
+            emit("  ✅ 验证通过!")
         elif not announce:
-            print("  ℹ️ 未进行游客宣布：大家仍会思考，但归纳链条无法闭合")
-            print("     预期现象：无论有多少红眼睛，都不会有人离开")
-            print("  ✅ 演示通过!")
+            emit("  ℹ️ 未进行游客宣布：大家仍会思考，但归纳链条无法闭合")
+            emit("     预期现象：无论有多少红眼睛，都不会有人离开")
+            emit("  ✅ 演示通过!")
         elif is_exploratory:
-            print("  ℹ️ 使用了非标准/更真实的村民类型（例如 OpenAI）：不做‘第 N 天游离开’硬性验证")
+            emit("  ℹ️ 使用了非标准/更真实的村民类型（例如 OpenAI）：不做‘第 N 天游离开’硬性验证")
             if results["all_red_left"]:
-                print(f"     观察到：所有红眼睛在第 {results['days_to_leave']} 天离开")
+                emit(f"     观察到：所有红眼睛在第 {results['days_to_leave']} 天离开")
             else:
-                print("     观察到：并未在演示上限内全部离开（这在真实/有限理性模型中是可能的）")
+                emit("     观察到：并未在演示上限内全部离开（这在真实/有限理性模型中是可能的）")
         elif actual_day == expected_day:
-            print(f"  ✅ 验证通过!")
-            print(f"     预期: 所有 {num_red} 个红眼睛在第 {expected_day} 天离开")
-            print(f"     实际: 所有 {num_red} 个红眼睛在第 {actual_day} 天离开")
+            emit(f"  ✅ 验证通过!")
+            emit(f"     预期: 所有 {num_red} 个红眼睛在第 {expected_day} 天离开")
+            emit(f"     实际: 所有 {num_red} 个红眼睛在第 {actual_day} 天离开")
         else:
-            print(f"  ❌ 验证失败!")
-            print(f"     预期: 第 {expected_day} 天")
-            print(f"     实际: 第 {actual_day} 天")
+            emit(f"  ❌ 验证失败!")
+            emit(f"     预期: 第 {expected_day} 天")
+            emit(f"     实际: 第 {actual_day} 天")
         
         # 打印详细推理过程
-        print("\n" + "-" * 40)
-        print("🧠 红眼睛村民的推理过程:")
-        print("-" * 40)
+        emit("\n" + "-" * 40)
+        emit("🧠 红眼睛村民的推理过程:")
+        emit("-" * 40)
         for v in village.villagers:
-            if v.eye_color == EyeColor.RED:
-                print(f"\n  【{v}】")
-                for log in v.reasoning_log:
-                    print(f"    {log}")
+            if v.is_red:
+                emit(f"\n  【{v}】")
+                if v.reasoning_log:
+                    emit(v.reasoning_text(indent="    "))
+        _flush_lines(lines)
     
     return results
 
 
+def _flush_lines(lines: list[str]) -> None:
+    """把攒下的输出行一次性写到 stdout 并清空"""
+    if lines:
+        lines.append("")
+        sys.stdout.write("\n".join(lines))
+        lines.clear()
+
+
+def _max_days(num_red: int, announce: bool) -> int:
+    """模拟天数上限（无宣布时用更显著的演示上限）"""
+    return (num_red + 5) if announce else max(10, num_red + 10)
+
+
+def _run_perfect_fast(num_red: int, num_blue: int, announce: bool) -> dict:
+    """用 fast_sim 的整数模拟生成与 run_simulation 相同的结果字典"""
+    days, left_on_day = simulate_perfect(num_red, num_blue, announce, _max_days(num_red, announce))
+
+    # 与 Villager.__repr__ 相同的显示名，村民顺序与 create_village 一致
+    red_label = f"({EyeColor.RED.label}眼睛)"
+    blue_label = f"({EyeColor.BLUE.label}眼睛)"
+    labels = [f"红{i + 1}{red_label}" for i in range(num_red)]
+    labels += [f"蓝{i + 1}{blue_label}" for i in range(num_blue)]
+
+    left_by_day: dict[int, list[str]] = {}
+    for label, day in zip(labels, left_on_day):
+        if day:
+            left_by_day.setdefault(day, []).append(label)
+
+    all_red_left = num_red > 0 and all(left_on_day[i] for i in range(num_red))
+    return {
+        "num_red": num_red,
+        "num_blue": num_blue,
+        "days_to_leave": days if all_red_left else 0,
+        "all_red_left": all_red_left,
+        "left_villagers": [
+            {"name": label, "day": day} for label, day in zip(labels, left_on_day) if day
+        ] if all_red_left else [],
+        "daily_events": [
+            {"day": day, "left": left_by_day.get(day, [])} for day in range(1, days + 1)
+        ],
+    }
+
+
 def explain_puzzle():
     """打印谜题的详细解释"""
     explanation = """
@@ -12,6 +12,7 @@ Design goals:
 
 from __future__ import annotations
 
+import hmac
 import json
 import os
 import sys
@@ -38,6 +39,10 @@ load_dotenv()
 
 # Get password from environment or use default
 _APP_PASSWORD = os.getenv("APP_PASSWORD", "redblue")
+_APP_PASSWORD_BYTES = _APP_PASSWORD.encode("utf-8")
+
+
+_NULL_STATE_BODY = b'{"ok":true,"state":null}'
 
 
 class _AppState:
@@ -46,9 +51,16 @@ class _AppState:
     num_blue: int = 0
     reasoning_policy: ReasoningPolicy | None = None
     lock: threading.Lock
+    # Encoded `{"ok": true, "state": ...}`, re-rendered by every writer while it holds
+    # the lock. Readers just take the reference, so GET /api/state never waits.
+    state_body: bytes = _NULL_STATE_BODY
+    # id/name/eyeColor/villagerType per villager, built once per village.
+    static_for: Village | None = None
+    static_fields: list[dict[str, Any]]
 
     def __init__(self):
         self.lock = threading.Lock()
+        self.static_fields = []
 
 
 APP_STATE = _AppState()
@@ -68,8 +80,20 @@ def _read_json_body(handler: SimpleHTTPRequestHandler) -> dict[str, Any]:
     return obj
 
 
+# One shared encoder instead of building a new one per json.dumps call. Compact
+# separators keep large /api/state payloads small; responses never contain cycles.
+_JSON_ENCODE = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), check_circular=False).encode
+
+
+def _encode_json(obj: Any) -> bytes:
+    return _JSON_ENCODE(obj).encode("utf-8")
+
+
 def _send_json(handler: SimpleHTTPRequestHandler, status: int, obj: Any) -> None:
-    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    _send_json_bytes(handler, status, _encode_json(obj))
+
+
+def _send_json_bytes(handler: SimpleHTTPRequestHandler, status: int, data: bytes) -> None:
     handler.send_response(status)
     handler.send_header("Content-Type", "application/json; charset=utf-8")
     handler.send_header("Cache-Control", "no-store")
@@ -82,40 +106,73 @@ def _error(handler: SimpleHTTPRequestHandler, status: int, message: str) -> None
     _send_json(handler, status, {"ok": False, "error": message})
 
 
-def _eye_enum_to_name(v: Any) -> str:
-    # EyeColor Enum has .name as 'RED'/'BLUE'.
-    return str(getattr(getattr(v, "eye_color", None), "name", ""))
-
-
-def _village_to_state(village: Village, num_red: int, num_blue: int) -> dict[str, Any]:
-    villagers = []
-    for v in village.villagers:
-        villagers.append(
-            {
-                "id": int(v.id),
-                "name": str(v.name),
-                "eyeColor": _eye_enum_to_name(v),
-                "villagerType": str(getattr(v, "villager_type", "dummy")),
-                "hasLeft": bool(v.has_left),
-                "leftOnDay": int(v.left_on_day) if v.left_on_day is not None else None,
-                "observedRedEyes": int(getattr(v, "observed_red_eyes", 0)),
-                "observedLeftYesterday": int(getattr(v, "observed_left_yesterday", 0)),
-                "observedLeftTotal": int(getattr(v, "observed_left_total", 0)),
-                "reasoningLog": list(getattr(v, "reasoning_log", []) or []),
-            }
-        )
+# Indexed by the EyeColor int value; same strings as EyeColor.<member>.name.
+_EYE_NAMES = ("RED", "BLUE")
+
+
+def _static_villager_fields(village: Village) -> list[dict[str, Any]]:
+    """Per-villager fields that never change after the village is created."""
+    eye_names = _EYE_NAMES
+    return [
+        {"id": v.id, "name": v.name, "eyeColor": eye_names[v.eye_color], "villagerType": v.villager_type}
+        for v in village.villagers
+    ]
+
+
+def _village_to_state(
+    village: Village,
+    num_red: int,
+    num_blue: int,
+    static_fields: list[dict[str, Any]] | None = None,
+) -> dict[str, Any]:
+    # Villager/Village fields are typed slots, so read them directly instead of
+    # getattr()+int()/str() per field. Logs are not copied: callers encode the
+    # state right away while holding APP_STATE.lock.
+    if static_fields is None:
+        static_fields = _static_villager_fields(village)
+    villagers = [
+        {
+            **static,
+            "hasLeft": v.has_left,
+            "leftOnDay": v.left_on_day,
+            "observedRedEyes": v.observed_red_eyes,
+            "observedLeftYesterday": v.observed_left_yesterday,
+            "observedLeftTotal": v.observed_left_total,
+            "reasoningLog": v.reasoning_log,
+        }
+        for static, v in zip(static_fields, village.villagers)
+    ]
 
     return {
-        "numRed": int(num_red),
-        "numBlue": int(num_blue),
-        "announcementMade": bool(getattr(village, "announcement_made", False)),
-        "currentDay": int(getattr(village, "current_day", 0)),
-        "knowledgeLevel": int(getattr(village, "knowledge_level", 0)),
+        "numRed": num_red,
+        "numBlue": num_blue,
+        "announcementMade": village.announcement_made,
+        "currentDay": village.current_day,
+        "knowledgeLevel": village.knowledge_level,
         "villagers": villagers,
-        "dailyLog": list(getattr(village, "daily_log", []) or []),
+        "dailyLog": village.daily_log,
     }
 
 
+# Minimum time between intermediate state snapshots during /api/run_all.
+_PUBLISH_INTERVAL_S = 0.5
+
+
+def _publish_state() -> bytes:
+    """Re-render APP_STATE.state_body after a mutation; call with APP_STATE.lock held."""
+    village = APP_STATE.village
+    if village is None:
+        body = _NULL_STATE_BODY
+    else:
+        if APP_STATE.static_for is not village:
+            APP_STATE.static_fields = _static_villager_fields(village)
+            APP_STATE.static_for = village
+        state = _village_to_state(village, APP_STATE.num_red, APP_STATE.num_blue, APP_STATE.static_fields)
+        body = _encode_json({"ok": True, "state": state})
+    APP_STATE.state_body = body
+    return body
+
+
 def _build_reasoning_policy(openai_style: str) -> ReasoningPolicy:
     # Keep mapping names aligned with existing Python policies.
     return PolicyByVillagerType(
@@ -149,6 +206,14 @@ def _build_villager_types(num_red: int, num_blue: int, mode: str) -> list[str]:
 
 
 class Handler(SimpleHTTPRequestHandler):
+    # Keep-alive: the polling UI reuses one connection (and so one server thread)
+    # instead of ThreadingHTTPServer spawning a thread per request. Every response
+    # therefore carries a Content-Length, or closes the connection when streaming.
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections are closed after this many seconds, so an
+    # abandoned tab does not pin a server thread forever.
+    timeout = 30
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, directory=str(_WEB_DIR), **kwargs)
 
@@ -160,20 +225,13 @@ class Handler(SimpleHTTPRequestHandler):
     def do_POST(self) -> None:  # noqa: N802
         if self.path.startswith("/api/"):
             return self._handle_api_post()
+        # The request body was not read, so the connection cannot be reused.
+        self.close_connection = True
         self.send_error(404)
 
     def _handle_api_get(self) -> None:
         if self.path.startswith("/api/state"):
-            if APP_STATE.village is None:
-                return _send_json(self, 200, {"ok": True, "state": None})
-            return _send_json(
-                self,
-                200,
-                {
-                    "ok": True,
-                    "state": _village_to_state(APP_STATE.village, APP_STATE.num_red, APP_STATE.num_blue),
-                },
-            )
+            return _send_json_bytes(self, 200, APP_STATE.state_body)
 
         if self.path.startswith("/api/health"):
             return _send_json(self, 200, {"ok": True})
@@ -192,10 +250,11 @@ class Handler(SimpleHTTPRequestHandler):
         try:
             if self.path.startswith("/api/verify_password"):
                 password = body.get("password", "")
-                if password == _APP_PASSWORD:
-                    return _send_json(self, 200, {"ok": True, "valid": True})
-                else:
-                    return _send_json(self, 200, {"ok": True, "valid": False})
+                # Constant-time compare so response timing does not leak the password.
+                valid = isinstance(password, str) and hmac.compare_digest(
+                    password.encode("utf-8"), _APP_PASSWORD_BYTES
+                )
+                return _send_json(self, 200, {"ok": True, "valid": valid})
             if self.path.startswith("/api/init"):
                 return self._api_init(body)
             if self.path.startswith("/api/announce"):
@@ -203,13 +262,14 @@ class Handler(SimpleHTTPRequestHandler):
             if self.path.startswith("/api/next"):
                 return self._api_next()
             if self.path.startswith("/api/run_all"):
-                return self._api_run_all()
+                return self._api_run_all(body)
             if self.path.startswith("/api/reset"):
                 with APP_STATE.lock:
                     APP_STATE.village = None
                     APP_STATE.num_red = 0
                     APP_STATE.num_blue = 0
                     APP_STATE.reasoning_policy = None
+                    _publish_state()
                 return _send_json(self, 200, {"ok": True, "state": None})
         except ValueError as e:
             return _error(self, 400, str(e))
@@ -251,57 +311,107 @@ class Handler(SimpleHTTPRequestHandler):
             APP_STATE.num_red = num_red
             APP_STATE.num_blue = num_blue
             APP_STATE.reasoning_policy = policy
+            body = _publish_state()
 
-        return _send_json(self, 200, {"ok": True, "state": _village_to_state(village, num_red, num_blue)})
+        return _send_json_bytes(self, 200, body)
 
     def _api_announce(self) -> None:
         with APP_STATE.lock:
             if APP_STATE.village is None:
                 raise ValueError("Not initialized")
             APP_STATE.village.make_announcement()
-            return _send_json(
-                self,
-                200,
-                {"ok": True, "state": _village_to_state(APP_STATE.village, APP_STATE.num_red, APP_STATE.num_blue)},
-            )
+            return _send_json_bytes(self, 200, _publish_state())
 
     def _api_next(self) -> None:
         with APP_STATE.lock:
             if APP_STATE.village is None:
                 raise ValueError("Not initialized")
             APP_STATE.village.simulate_day()
-            return _send_json(
-                self,
-                200,
-                {"ok": True, "state": _village_to_state(APP_STATE.village, APP_STATE.num_red, APP_STATE.num_blue)},
-            )
-
-    def _api_run_all(self) -> None:
-        if APP_STATE.village is None:
-            raise ValueError("Not initialized")
-
-        village = APP_STATE.village
-        num_red = APP_STATE.num_red
-
-        def is_finished() -> bool:
-            if num_red == 0:
-                return True
-            return all(v.has_left for v in village.villagers if _eye_enum_to_name(v) == "RED")
-
-        cap = max(5, num_red + 10) if village.announcement_made else 20
-        steps = 0
-        while not is_finished() and steps < cap:
-            village.simulate_day()
-            steps += 1
-
-        if not village.announcement_made and not is_finished():
-            village.daily_log.append(f"\n⏹️ 已停止：未宣布时不会收敛，已演示 {cap} 天。")
-
-        return _send_json(
-            self,
-            200,
-            {"ok": True, "state": _village_to_state(village, APP_STATE.num_red, APP_STATE.num_blue)},
-        )
+            return _send_json_bytes(self, 200, _publish_state())
+
+    def _api_run_all(self, body: dict[str, Any]) -> None:
+        """Run until every red-eyed villager has left (or the demo cap is hit).
+
+        With `{"stream": true}` the response is NDJSON: one compact line per simulated
+        day (`{"day", "left": [ids], "logs": [...]}`) as soon as it finishes, then the
+        usual `{"ok": true, "state": ...}` line. Otherwise a single JSON response.
+        """
+        # Hold the lock for the whole run so /api/next or /api/init cannot interleave
+        # with it. Within each day, OpenAI villagers are already consulted concurrently
+        # (PolicyByVillagerType.decide_many), so a day costs ~one round-trip, not N.
+        with APP_STATE.lock:
+            if APP_STATE.village is None:
+                raise ValueError("Not initialized")
+
+            village = APP_STATE.village
+            num_red = APP_STATE.num_red
+            stream = bool(body.get("stream", False))
+
+            if stream:
+                self._begin_ndjson()
+
+            cap = max(5, num_red + 10) if village.announcement_made else 20
+            steps = 0
+            last_published = time.monotonic()
+            try:
+                # Village keeps the remaining-red count up to date, so this is O(1).
+                while village.get_remaining_red_count() > 0 and steps < cap:
+                    prev_log_len = len(village.daily_log)
+                    left_today = village.simulate_day()
+                    steps += 1
+                    # Let pollers of /api/state follow a slow (LLM) run. Each snapshot
+                    # re-encodes every log so far, so re-render at most every
+                    # _PUBLISH_INTERVAL_S instead of every day; that keeps a fast run at
+                    # one final encode instead of O(days²) log encoding.
+                    if not stream and time.monotonic() - last_published >= _PUBLISH_INTERVAL_S:
+                        _publish_state()
+                        last_published = time.monotonic()
+                    if stream:
+                        delta = {
+                            "day": village.current_day,
+                            "left": [v.id for v in left_today],
+                            "logs": village.daily_log[prev_log_len:],
+                        }
+                        if not self._write_ndjson_line(_encode_json(delta)):
+                            # The client went away: stop simulating on its behalf.
+                            return None
+
+                if not village.announcement_made and village.get_remaining_red_count() > 0:
+                    village.daily_log.append(f"\n⏹️ 已停止：未宣布时不会收敛，已演示 {cap} 天。")
+            except Exception as e:
+                if not stream:
+                    raise
+                # Headers are already sent, so report the failure as the last line.
+                traceback.print_exc()
+                error = _encode_json({"ok": False, "error": str(e)})
+                self._write_ndjson_line(error)
+                return None
+            finally:
+                # However the run ends (finished, client gone, or failed part-way),
+                # the village has advanced: /api/state must serve the current state.
+                state_body = _publish_state()
+
+            if stream:
+                self._write_ndjson_line(state_body)
+                return None
+            return _send_json_bytes(self, 200, state_body)
+
+    def _begin_ndjson(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Cache-Control", "no-store")
+        # No Content-Length: the stream ends when the connection closes.
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def _write_ndjson_line(self, data: bytes) -> bool:
+        try:
+            self.wfile.write(data + b"\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return False
+        return True
 
 
 def main() -> None:
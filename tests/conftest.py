@@ -0,0 +1,76 @@
+from typing import Callable, Iterator, Optional
+
+import pytest
+
+import src.reasoning as reasoning_mod
+
+
+class FakeOpenAI:
+    """Stand-in for `_openai_chat_completions`: counts calls and returns `reply`."""
+
+    def __init__(self) -> None:
+        self.requests: list[dict] = []
+        self.reply = '{"leave": false, "confidence_red": 0.0, "public_reason": "再等等", "key_points": []}'
+        # Optional hook run inside every call (e.g. a barrier to prove concurrency).
+        self.on_call: Optional[Callable[[], None]] = None
+
+    @property
+    def calls(self) -> int:
+        return len(self.requests)
+
+    def __call__(self, *args, **kwargs) -> str:
+        # list.append is atomic, so concurrent calls need no lock or separate counter.
+        self.requests.append(kwargs)
+        if self.on_call is not None:
+            self.on_call()
+        return self.reply
+
+
+# Provider settings read by OpenAIReasoningPolicy; a developer's real values (or
+# a local .env) must not leak into tests or make them hit the network.
+_OPENAI_ENV = (
+    "OPENAI_API_KEY",
+    "OPENAI_MODEL",
+    "OPENAI_BASE_URL",
+    "OPENAI_CACHE_PATH",
+    "SILICONFLOW_API_KEY",
+    "SILICONFLOW_MODEL",
+    "SILICONFLOW_BASE_URL",
+)
+
+
+@pytest.fixture(autouse=True)
+def _isolate_openai_env(monkeypatch) -> Iterator[None]:
+    """Every test starts without provider credentials and without loading .env.
+
+    All OpenAI state a test touches is then per-test (env, stubs, tmp_path
+    caches), so the suite also runs in parallel under `pytest -n auto`.
+    Response caches opened during the test are closed and forgotten afterwards,
+    so no sqlite connection outlives its tmp_path file.
+    """
+    for name in _OPENAI_ENV:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(reasoning_mod, "load_dotenv", lambda *args, **kwargs: False)
+
+    opened: list[reasoning_mod._ResponseCache] = []
+
+    class _TrackedResponseCache(reasoning_mod._ResponseCache):
+        def __init__(self, path: str) -> None:
+            super().__init__(path)
+            opened.append(self)
+
+    monkeypatch.setattr(reasoning_mod, "_ResponseCache", _TrackedResponseCache)
+    yield
+    reasoning_mod._response_cache.cache_clear()
+    for cache in opened:
+        cache.close()
+
+
+@pytest.fixture
+def fake_openai(monkeypatch) -> FakeOpenAI:
+    """Route OpenAIReasoningPolicy to a local stub with test credentials."""
+    fake = FakeOpenAI()
+    monkeypatch.setattr(reasoning_mod, "_openai_chat_completions", fake)
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_MODEL", "test-model")
+    return fake
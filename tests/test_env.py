@@ -0,0 +1,70 @@
+import os
+
+from src.env import load_dotenv
+
+
+def test_load_dotenv_parses_comments_export_and_quotes(tmp_path, monkeypatch) -> None:
+    env = tmp_path / ".env"
+    env.write_text(
+        "# comment\n"
+        "\n"
+        "RBE_PLAIN=value\n"
+        "  export RBE_EXPORTED = spaced  \n"
+        "RBE_DQ=\"double quoted\"\r\n"
+        "RBE_SQ='single'\n"
+        "RBE_NO_SEP\n"
+        "=no_key\n"
+        "RBE BAD=ignored\n"
+        "RBE_UTF8=红眼睛",
+        encoding="utf-8",
+    )
+    for key in ("RBE_PLAIN", "RBE_EXPORTED", "RBE_DQ", "RBE_SQ", "RBE_UTF8", "RBE_NO_SEP"):
+        # setenv first so monkeypatch restores the (absent) original on teardown.
+        monkeypatch.setenv(key, "")
+        monkeypatch.delenv(key)
+
+    assert load_dotenv(env) is True
+
+    assert os.environ["RBE_PLAIN"] == "value"
+    assert os.environ["RBE_EXPORTED"] == "spaced"
+    assert os.environ["RBE_DQ"] == "double quoted"
+    assert os.environ["RBE_SQ"] == "single"
+    assert os.environ["RBE_UTF8"] == "红眼睛"
+    assert "RBE_NO_SEP" not in os.environ
+    assert "RBE BAD" not in os.environ
+
+
+def test_load_dotenv_respects_override_flag(tmp_path, monkeypatch) -> None:
+    env = tmp_path / ".env"
+    env.write_text("RBE_KEEP=from_file\n", encoding="utf-8")
+    monkeypatch.setenv("RBE_KEEP", "from_env")
+
+    load_dotenv(env)
+    assert os.environ["RBE_KEEP"] == "from_env"
+
+    load_dotenv(env, override=True)
+    assert os.environ["RBE_KEEP"] == "from_file"
+
+
+def test_load_dotenv_missing_file_returns_false(tmp_path) -> None:
+    assert load_dotenv(tmp_path / "missing.env") is False
+
+
+def test_load_dotenv_empty_file_is_parsed(tmp_path) -> None:
+    env = tmp_path / ".env"
+    env.write_bytes(b"")
+    assert load_dotenv(env) is True
+
+
+def test_load_dotenv_skips_comments_containing_separator(tmp_path, monkeypatch) -> None:
+    env = tmp_path / ".env"
+    env.write_text("# RBE_COMMENTED=1\n  #RBE_INDENTED=1\nexport  RBE_WIDE=ok\n", encoding="utf-8")
+    for key in ("RBE_COMMENTED", "RBE_INDENTED", "RBE_WIDE"):
+        monkeypatch.setenv(key, "")
+        monkeypatch.delenv(key)
+
+    load_dotenv(env)
+
+    assert "RBE_COMMENTED" not in os.environ
+    assert "RBE_INDENTED" not in os.environ
+    assert os.environ["RBE_WIDE"] == "ok"
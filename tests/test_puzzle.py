@@ -4,8 +4,12 @@
 验证核心逻辑的正确性
 """
 
+import os
+import subprocess
+import sys
+
 import pytest
-from src.puzzle import Village, Villager, EyeColor
+from src.puzzle import Village, Villager, EyeColor, iter_bits
 from src.knowledge import (
     KnowledgeState,
     CommonKnowledge,
@@ -13,7 +17,20 @@ from src.knowledge import (
     build_nested_knowledge_string,
 )
 from src.simulation import create_village, run_simulation
-from src.reasoning import NoReasoningPolicy, BoundedInductionPolicy, MaxDayReasoningPolicy, FalliblePolicy
+from src.reasoning import (
+    _is_blue,
+    NoReasoningPolicy,
+    BoundedInductionPolicy,
+    MaxDayReasoningPolicy,
+    FalliblePolicy,
+    PerfectInductionPolicy,
+    PolicyByVillagerType,
+)
+
+
+# 按类型路由的策略不会走 fast_sim 的整数快速路径，但行为同样是完美归纳：
+# 用它让核心定理测试真正跑逐个村民的 Village 引擎
+_VILLAGE_ENGINE = PolicyByVillagerType({}, default=PerfectInductionPolicy())
 
 
 class TestVillager:
@@ -40,12 +57,43 @@ class TestVillager:
         assert v1.observed_red_eyes == 1
     
     def test_villager_leave(self):
-        """测试村民离开"""
-        v = Villager(id=1, eye_color=EyeColor.RED)
-        v.leave(day=3)
+        """测试村民离开：经由村庄登记，计数器和列式数组同步更新"""
+        village = Village()
+        v = village.add_villager(Villager(id=7, eye_color=EyeColor.RED))
+        village.current_day = 3
+        village.record_leave(v)
         
         assert v.has_left
         assert v.left_on_day == 3
+        assert village.get_remaining_red_count() == 0
+        assert village.arrays.active == 0
+
+    def test_unregistered_villager_cannot_leave(self):
+        """测试直接塞进 villagers 列表的村民不会破坏村庄状态"""
+        village = Village()
+        stray = Villager(id=1, eye_color=EyeColor.BLUE)
+        village.villagers.append(stray)
+
+        with pytest.raises(ValueError, match="add_villager"):
+            village.record_leave(stray)
+        assert not stray.has_left
+        with pytest.raises(ValueError):
+            village.add_villager(village.add_villager(EyeColor.RED))
+
+    def test_eye_color_is_int_with_label(self):
+        """EyeColor 是整数枚举，展示文字不变"""
+        assert EyeColor.RED == 0 and EyeColor.BLUE == 1
+        assert Villager(id=1, eye_color=EyeColor.RED).is_red
+        assert not Villager(id=2, eye_color=EyeColor.BLUE).is_red
+        recoloured = Villager(id=4, eye_color=EyeColor.BLUE)
+        recoloured.eye_color = EyeColor.RED
+        assert recoloured.is_red and not _is_blue(recoloured)
+        assert repr(Villager(id=3, eye_color=EyeColor.BLUE, name="蓝1")) == "蓝1(蓝色眼睛)"
+        # 旧的中文值契约：str() 与按中文值构造仍然可用
+        assert str(EyeColor.RED) == f"{EyeColor.RED}" == "红色"
+        assert EyeColor("蓝色") is EyeColor.BLUE and EyeColor(0) is EyeColor.RED
+        with pytest.raises(ValueError):
+            EyeColor("绿色")
 
 
 class TestVillage:
@@ -61,6 +109,62 @@ class TestVillage:
         assert village.get_red_eye_count() == 1
         assert village.get_blue_eye_count() == 1
     
+    def test_refresh_observations_matches_per_villager_observe(self):
+        """测试批量更新观察与逐个观察结果一致（包括有人离开后）"""
+        village = create_village(num_red=3, num_blue=2)
+        village.record_leave(village.villagers[0])
+        village.refresh_observations()
+
+        for v in village.villagers:
+            if v.has_left:
+                continue
+            expected = Villager(id=v.id, eye_color=v.eye_color)
+            expected.observe(village.villagers)
+            assert v.observed_red_eyes == expected.observed_red_eyes
+    
+    def test_counters_follow_leaves(self):
+        """测试计数器随离开同步更新"""
+        village = create_village(num_red=3, num_blue=2)
+        village.record_leave(village.villagers[0])
+        village.record_leave(village.villagers[0])  # 重复离开不重复计数
+
+        assert village.get_red_eye_count() == 3
+        assert village.get_blue_eye_count() == 2
+        assert village.get_remaining_red_count() == 2
+        assert len(village.get_remaining_villagers()) == 4
+        assert "已离开: 1 人" in village.print_status()
+        assert "剩余: 4 人" in village.print_status()
+    
+    def test_arrays_track_villagers(self):
+        """测试列式视图与村民对象保持一致"""
+        village = create_village(num_red=2, num_blue=1)
+        village.current_day = 2
+        village.record_leave(village.villagers[1])
+        arrays = village.arrays
+
+        assert arrays.size == 3
+        assert list(iter_bits(arrays.active)) == [0, 2]
+        assert list(iter_bits(arrays.active & arrays.eye_red)) == [0]
+        assert village.get_remaining_red_count() == 1
+    
+    def test_set_logging_disables_reasoning_log(self):
+        """测试关闭日志后推理结果不变，但不再写推理日志"""
+        village = create_village(num_red=2, num_blue=1)
+        village.set_logging(False)
+        village.make_announcement()
+        village.simulate_day()
+        left = village.simulate_day()
+
+        assert len(left) == 2
+        assert all(v.reasoning_log == [] for v in village.villagers)
+
+    def test_rbe_log_env_disables_logging_by_default(self):
+        """测试 RBE_LOG=0 时新建村民默认不记录推理日志"""
+        code = "from src.simulation import create_village; print(create_village(1, 1).villagers[0].record_log)"
+        env = {**os.environ, "RBE_LOG": "0"}
+        out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        assert out.stdout.strip() == "False"
+    
     def test_announcement(self):
         """测试公开宣布"""
         village = Village()
@@ -135,15 +239,26 @@ class TestSimulation:
         
         这是红蓝眼谜题的核心定理
         """
-        result = run_simulation(num_red, num_blue, verbose=False)
+        result = run_simulation(num_red, num_blue, verbose=False, reasoning_policy=_VILLAGE_ENGINE)
         
         assert result["days_to_leave"] == expected_day, \
             f"预期第{expected_day}天离开，实际第{result['days_to_leave']}天"
         assert result["all_red_left"], "并非所有红眼睛都离开了"
+
+    @pytest.mark.parametrize("num_red,num_blue", [(0, 3), (1, 0), (2, 2), (5, 3), (12, 4)])
+    @pytest.mark.parametrize("announce", [True, False])
+    def test_fast_path_matches_village_engine(self, num_red, num_blue, announce):
+        """测试整数快速路径与逐个村民的模拟结果完全一致"""
+        slow = run_simulation(
+            num_red, num_blue, verbose=False, announce=announce, reasoning_policy=_VILLAGE_ENGINE
+        )
+        fast = run_simulation(num_red, num_blue, verbose=False, announce=announce)
+
+        assert fast == slow
     
     def test_no_red_eyes(self):
         """测试没有红眼睛的情况"""
-        result = run_simulation(0, 5, verbose=False)
+        result = run_simulation(0, 5, verbose=False, reasoning_policy=_VILLAGE_ENGINE)
         
         assert result["days_to_leave"] == 0
         assert not result["all_red_left"]  # 没有红眼睛需要离开
@@ -154,7 +269,7 @@ class TestSimulation:
 
         直觉：没有宣布就没有公共知识的“计时起点”，归纳链条无法启动。
         """
-        result = run_simulation(3, 2, verbose=False, announce=False)
+        result = run_simulation(3, 2, verbose=False, announce=False, reasoning_policy=_VILLAGE_ENGINE)
 
         assert result["days_to_leave"] == 0
         assert not result["all_red_left"]
@@ -219,13 +334,61 @@ class TestSimulation:
     
     def test_all_red_leave_same_day(self):
         """测试所有红眼睛在同一天离开"""
-        result = run_simulation(4, 3, verbose=False)
+        result = run_simulation(4, 3, verbose=False, reasoning_policy=_VILLAGE_ENGINE)
         
         # 所有离开的村民应该在同一天离开
         left_days = [v["day"] for v in result["left_villagers"]]
         assert len(set(left_days)) == 1, "红眼睛不是同一天离开的"
         assert left_days[0] == 4
     
+    @pytest.mark.parametrize("num_red,num_blue", [(1, 2), (3, 2), (6, 0)])
+    def test_vectorized_decision_matches_policy_path(self, num_red, num_blue):
+        """测试关闭日志后的整村决策与逐个调用策略的离开结果一致"""
+        logged = create_village(num_red=num_red, num_blue=num_blue)
+        fast = create_village(num_red=num_red, num_blue=num_blue)
+        fast.set_logging(False)
+        assert fast._decide_leave_vectorized(1) == [] and logged._decide_leave_vectorized(1) is None
+
+        for village in (logged, fast):
+            village.make_announcement()
+            for _ in range(num_red + 2):
+                village.simulate_day()
+
+        assert [v.left_on_day for v in fast.villagers] == [v.left_on_day for v in logged.villagers]
+    
+    def test_days_after_all_red_left_skip_reasoning(self, monkeypatch):
+        """测试红眼睛全部离开后，不写日志时标准归纳不再被询问，但观察信息照常更新"""
+        village = create_village(num_red=1, num_blue=2)
+        for v in village.villagers:
+            v.record_log = False
+        village.make_announcement()
+        assert len(village.simulate_day()) == 1
+
+        def fail(*args, **kwargs):
+            raise AssertionError("policy consulted after every red-eye left")
+
+        monkeypatch.setattr(PerfectInductionPolicy, "decide", fail)
+        monkeypatch.setattr(PerfectInductionPolicy, "decide_batch", fail)
+        assert village.simulate_day() == []
+        assert village.current_day == 2
+        assert [v.observed_left_total for v in village.villagers if not v.has_left] == [1, 1]
+        assert [v.observed_left_yesterday for v in village.villagers if not v.has_left] == [1, 1]
+
+    def test_days_after_all_red_left_still_ask_other_policies(self):
+        """测试红眼睛全部离开后，可能让蓝眼睛离开的策略（及推理日志）仍照常进行"""
+
+        class LeaveAfterFirstDay:
+            def decide(self, villager, day, public_announcement_made):
+                villager.reasoning_log.append(f"第{day}天")
+                return day > 1 or villager.is_red
+
+        village = create_village(num_red=1, num_blue=2, reasoning_policy=LeaveAfterFirstDay())
+        village.make_announcement()
+        village.simulate_day()
+
+        assert [v.name for v in village.simulate_day()] == ["蓝1", "蓝2"]
+        assert [len(v.reasoning_log) for v in village.villagers] == [1, 2, 2]
+
     def test_blue_eyes_stay(self):
         """测试蓝眼睛不会离开"""
         village = create_village(num_red=3, num_blue=2)
@@ -246,21 +409,21 @@ class TestEdgeCases:
     
     def test_single_red_eye(self):
         """测试只有一个红眼睛的情况"""
-        result = run_simulation(1, 5, verbose=False)
+        result = run_simulation(1, 5, verbose=False, reasoning_policy=_VILLAGE_ENGINE)
         
         assert result["days_to_leave"] == 1
         assert len(result["left_villagers"]) == 1
     
     def test_all_red_eyes(self):
         """测试全是红眼睛的情况"""
-        result = run_simulation(5, 0, verbose=False)
+        result = run_simulation(5, 0, verbose=False, reasoning_policy=_VILLAGE_ENGINE)
         
         assert result["days_to_leave"] == 5
         assert len(result["left_villagers"]) == 5
     
     def test_many_red_eyes(self):
         """测试大量红眼睛的情况"""
-        result = run_simulation(20, 10, verbose=False)
+        result = run_simulation(20, 10, verbose=False, reasoning_policy=_VILLAGE_ENGINE)
         
         assert result["days_to_leave"] == 20
         assert result["all_red_left"]
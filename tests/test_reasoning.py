@@ -1,10 +1,27 @@
-from src.puzzle import EyeColor, Villager
+import json
+import os.path
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import src.reasoning as reasoning_mod
+from src.puzzle import EyeColor, Villager, iter_bits
 from src.reasoning import (
+    _extract_first_json_object,
     _perfect_induction_decide_no_log,
+    _perfect_induction_leave_mask,
     _reason_implies_certain_red_eye,
     _should_force_leave,
+    _u01,
+    BoundedInductionPolicy,
+    FalliblePolicy,
+    NoReasoningPolicy,
     OpenAIReasoningPolicy,
+    PerfectInductionPolicy,
+    PolicyByVillagerType,
 )
+from src.simulation import create_village
 
 
 def test_reason_implies_certain_red_eye_true_on_explicit_positive() -> None:
@@ -23,6 +40,25 @@ def test_reason_implies_certain_red_eye_false_without_certainty_marker() -> None
     assert _reason_implies_certain_red_eye("我是红眼睛（只是猜测）") is False
 
 
+def test_reason_implies_certain_red_eye_caches_repeated_reasons() -> None:
+    _reason_implies_certain_red_eye.cache_clear()
+    for _ in range(3):
+        assert _reason_implies_certain_red_eye("我确定我是红眼，所以今晚离开") is True
+    info = _reason_implies_certain_red_eye.cache_info()
+    assert (info.hits, info.misses) == (2, 1)
+
+
+def test_extract_first_json_object_ignores_surrounding_text() -> None:
+    assert _extract_first_json_object('{"leave": true}') == {"leave": True}
+    assert _extract_first_json_object('好的：\n{"leave": false, "k": {"x": "}"}}\n以上。{"b": 1}') == {
+        "leave": False,
+        "k": {"x": "}"},
+    }
+    assert _extract_first_json_object('{坏的} 然后 {"leave": true}') == {"leave": True}
+    with pytest.raises(ValueError):
+        _extract_first_json_object('{"leave": true')
+
+
 def test_should_force_leave_by_confidence_threshold() -> None:
     leave, forced = _should_force_leave(
         leave=False,
@@ -44,16 +80,28 @@ def test_should_force_leave_by_confidence_threshold() -> None:
     assert forced is False
 
 
-def test_perfect_induction_decide_no_log_matches_expected_without_mutation() -> None:
+@pytest.fixture
+def red_seeing_two() -> Villager:
     v = Villager(id=1, eye_color=EyeColor.RED, name="红1")
     v.observed_red_eyes = 2
     v.reasoning_log.append("pre")
+    return v
 
-    # observed_red_eyes=2 => leave day is 3
-    assert _perfect_induction_decide_no_log(v, day=1, public_announcement_made=True) is False
-    assert _perfect_induction_decide_no_log(v, day=2, public_announcement_made=True) is False
-    assert _perfect_induction_decide_no_log(v, day=3, public_announcement_made=True) is True
-    assert v.reasoning_log == ["pre"]
+
+# observed_red_eyes=2 => leave day is 3
+@pytest.mark.parametrize("day,expected", [(1, False), (2, False), (3, True)])
+def test_perfect_induction_decide_no_log_matches_expected(red_seeing_two, day, expected) -> None:
+    assert _perfect_induction_decide_no_log(red_seeing_two, day=day, public_announcement_made=True) is expected
+
+
+def test_perfect_induction_decide_no_log_does_not_mutate(red_seeing_two) -> None:
+    log = red_seeing_two.reasoning_log
+    for day in (1, 2, 3):
+        _perfect_induction_decide_no_log(red_seeing_two, day=day, public_announcement_made=True)
+    # Same list object (not replaced), nothing appended, original entry intact.
+    assert red_seeing_two.reasoning_log is log
+    assert len(log) == 1 and log[0] == "pre"
+    assert not red_seeing_two.has_left
 
 
 def test_perfect_induction_decide_no_log_blue_or_no_announcement() -> None:
@@ -66,25 +114,363 @@ def test_perfect_induction_decide_no_log_blue_or_no_announcement() -> None:
     assert _perfect_induction_decide_no_log(v_red, day=1, public_announcement_made=False) is False
 
 
-def test_openai_absolute_rational_still_calls_openai_but_aligns_leave(monkeypatch) -> None:
-    calls = {"n": 0}
+def test_perfect_induction_leave_mask_matches_per_villager_rule() -> None:
+    village = create_village(num_red=3, num_blue=2)
+    village.record_leave(village.villagers[4])  # a blue leaves; reds unaffected
+    village.refresh_observations()
+    arrays = village.arrays
+
+    for announced in (False, True):
+        for day in range(1, 6):
+            mask = _perfect_induction_leave_mask(arrays.eye_red, arrays.active, day, announced)
+            expected = [
+                v.idx
+                for v in village.villagers
+                if _perfect_induction_decide_no_log(v, day, announced)
+            ]
+            assert list(iter_bits(mask)) == expected
+
+
+@pytest.mark.parametrize("max_k", [-1, 0, 1, 2, 3])
+def test_bounded_induction_fast_paths_match_logged_decide(max_k) -> None:
+    policy = BoundedInductionPolicy(max_k=max_k)
+    village = create_village(num_red=3, num_blue=2)
+    village.refresh_observations()
+    arrays = village.arrays
+
+    for announced in (False, True):
+        for day in range(1, 6):
+            village.set_logging(True)
+            expected = [v.idx for v in village.villagers if policy.decide(v, day, announced)]
+            village.set_logging(False)
+            fast = [v.idx for v in village.villagers if policy.decide(v, day, announced)]
+            mask = policy.decide_batch(village.villagers, arrays, day, announced)
+            assert fast == expected
+            assert list(iter_bits(mask)) == expected
+
+
+def test_fallible_primed_and_batched_draws_match_lazy_draws() -> None:
+    village = create_village(num_red=20, num_blue=3)
+    village.set_logging(False)
+    village.refresh_observations()
+
+    lazy = FalliblePolicy(mistake_rate=0.5, seed=7)
+    primed = FalliblePolicy(mistake_rate=0.5, seed=7).primed(village.villagers, n_days=25)
+    assert primed == lazy
+
+    expected = [v.idx for v in village.villagers if lazy.decide(v, 20, True)]
+    assert 0 < len(expected) < 20
+    assert [v.idx for v in village.villagers if primed.decide(v, 20, True)] == expected
+    for policy in (lazy, primed):
+        assert list(iter_bits(policy.decide_batch(village.villagers, village.arrays, 20, True))) == expected
+
+
+def test_fallible_primed_for_a_subset_still_draws_for_everyone_else() -> None:
+    village = create_village(num_red=20, num_blue=3)
+    village.set_logging(False)
+    village.refresh_observations()
+
+    lazy = FalliblePolicy(mistake_rate=0.5, seed=7)
+    primed = lazy.primed(village.villagers[:5], n_days=3)
+    assert primed._primed_ids == sum(1 << v.id for v in village.villagers[:5])
+    assert lazy._mistakes == ()
+
+    # 预抽范围外的村民（第 6 个起）和天数（第 4 天起）都与未预抽时一致
+    expected = [[lazy._makes_mistake(v, day) for v in village.villagers] for day in range(1, 6)]
+    assert [[primed._makes_mistake(v, day) for v in village.villagers] for day in range(1, 6)] == expected
+    assert any(row[5:].count(True) for row in expected[:3])
+    expected = [v.idx for v in village.villagers if lazy.decide(v, 20, True)]
+    assert [v.idx for v in village.villagers if primed.decide(v, 20, True)] == expected
 
-    def fake_chat(*args, **kwargs):
-        calls["n"] += 1
-        # Deliberately contradict the standard proof: claim leave=false with 0 confidence.
-        return '{"leave": false, "confidence_red": 0.0, "public_reason": "我不确定", "key_points": ["x"]}'
 
-    import src.reasoning as reasoning_mod
+def test_policy_by_villager_type_batches_only_homogeneous_villages() -> None:
+    policy = PolicyByVillagerType({"dummy": PerfectInductionPolicy(), "openai": NoReasoningPolicy()})
 
-    monkeypatch.setattr(reasoning_mod, "_openai_chat_completions", fake_chat)
-    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
-    monkeypatch.setenv("OPENAI_MODEL", "test-model")
+    village = create_village(num_red=2, num_blue=1, reasoning_policy=policy)
+    arrays = village.arrays
+    assert policy.decide_batch(village.villagers, arrays, 2, True) == arrays.eye_red
+
+    mixed = create_village(
+        num_red=2, num_blue=1, reasoning_policy=policy, villager_types=["openai", "dummy", "dummy"]
+    )
+    assert policy.decide_batch(mixed.villagers, mixed.arrays, 2, True) is None
+
+
+def test_policy_by_villager_type_routes_unknown_types_to_default() -> None:
+    village = create_village(num_red=1, num_blue=0, villager_types=["mystery"])
+    red = village.villagers[0]
+    red.observed_red_eyes = 0
+
+    assert PolicyByVillagerType({"dummy": NoReasoningPolicy()}).decide(red, 1, True) is True
+    assert PolicyByVillagerType({}, default=NoReasoningPolicy()).decide(red, 1, True) is False
+
+
+def test_u01_is_reproducible_and_uniform() -> None:
+    draws = [_u01(123, vid, day) for vid in range(1, 101) for day in range(1, 101)]
+
+    assert draws == [_u01(123, vid, day) for vid in range(1, 101) for day in range(1, 101)]
+    assert all(0.0 <= x < 1.0 for x in draws)
+    assert abs(sum(draws) / len(draws) - 0.5) < 0.02
+    assert _u01(123, 1, 1) != _u01(124, 1, 1)
+
+
+def test_openai_absolute_rational_still_calls_openai_but_aligns_leave(fake_openai) -> None:
+    # Deliberately contradict the standard proof: claim leave=true without certainty.
+    fake_openai.reply = '{"leave": true, "confidence_red": 0.5, "public_reason": "我想走", "key_points": ["x"]}'
 
     v = Villager(id=1, eye_color=EyeColor.RED, name="红1")
     v.villager_type = "openai"
     v.observed_red_eyes = 2
 
     policy = OpenAIReasoningPolicy(style="absolute_rational", align_to_standard_proof=True)
-    # For observed_red_eyes=2, leave day is 3.
-    assert policy.decide(v, day=3, public_announcement_made=True) is True
-    assert calls["n"] == 1
+    # For observed_red_eyes=2, leave day is 3: on day 2 the proof says stay.
+    assert policy.decide(v, day=2, public_announcement_made=True) is False
+    assert fake_openai.calls == 1
+
+
+def test_openai_aligned_policy_skips_the_model_when_the_proof_says_leave(fake_openai) -> None:
+    policy = OpenAIReasoningPolicy(style="absolute_rational")
+    villagers = [Villager(id=i, eye_color=EyeColor.RED, name=f"红{i}") for i in (1, 2, 3)]
+    for v in villagers:
+        v.observed_red_eyes = 2
+
+    # For observed_red_eyes=2, leave day is 3: nothing the model says can change that.
+    assert policy.decide(villagers[0], day=3, public_announcement_made=True) is True
+    assert policy.decide_many(villagers[1:], day=3, public_announcement_made=True) == [True, True]
+    assert fake_openai.calls == 0
+    assert all("未请求模型" in v.reasoning_log[-1] for v in villagers)
+
+
+def test_openai_prompts_share_a_stable_prefix_across_villagers_and_days(fake_openai) -> None:
+    policy = OpenAIReasoningPolicy(style="rational")
+    for vid, day in ((1, 1), (2, 4)):
+        v = Villager(id=vid, eye_color=EyeColor.RED, name=f"红{vid}")
+        v.observed_red_eyes = vid
+        policy.decide(v, day=day, public_announcement_made=True)
+
+    first, second = (r["messages"] for r in fake_openai.requests)
+    assert [m["role"] for m in first] == ["system", "user"]
+    assert first[0] == second[0]
+    # Only the trailing day-state block differs; the rules and JSON spec are shared.
+    shared = os.path.commonprefix([first[1]["content"], second[1]["content"]])
+    rules, _, _ = first[1]["content"].partition("今天是第")
+    assert "请输出严格 JSON" in rules and shared.startswith(rules)
+
+
+def test_openai_chat_completions_reuses_connection_and_falls_back() -> None:
+    seen = {"ports": set(), "payloads": []}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):  # noqa: N802
+            seen["ports"].add(self.client_address[1])
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            seen["payloads"].append(payload)
+            if "response_format" in payload:
+                status, body = 400, b"response_format unsupported"
+            else:
+                status, body = 200, json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode()
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        kwargs = dict(
+            api_key="k",
+            base_url=f"http://127.0.0.1:{server.server_address[1]}",
+            model="m",
+            messages=[],
+            temperature=0.0,
+            max_tokens=8,
+            timeout_s=5.0,
+        )
+        assert reasoning_mod._openai_chat_completions(**kwargs) == "ok"
+        assert reasoning_mod._openai_chat_completions(**kwargs) == "ok"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # 400 on response_format -> fallback attempt; the second call goes straight
+    # to the combination that worked, all over one kept-alive socket.
+    assert [("response_format" in p) for p in seen["payloads"]] == [True, False, False]
+    assert len(seen["ports"]) == 1
+
+
+def test_openai_chat_completions_does_not_retry_a_timed_out_request() -> None:
+    seen = []
+    release = threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):  # noqa: N802
+            seen.append(self.rfile.read(int(self.headers["Content-Length"])))
+            release.wait(5)  # never answers before the client gives up
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with pytest.raises(TimeoutError):
+            reasoning_mod._openai_chat_completions(
+                api_key="k",
+                base_url=f"http://127.0.0.1:{server.server_address[1]}",
+                model="m",
+                messages=[],
+                temperature=0.0,
+                max_tokens=8,
+                timeout_s=0.2,
+            )
+    finally:
+        release.set()
+        server.shutdown()
+        server.server_close()
+
+    assert len(seen) == 1
+
+
+def test_post_resends_only_over_a_reused_connection() -> None:
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):  # noqa: N802
+            seen.append(self.rfile.read(int(self.headers["Content-Length"])))
+            if len(seen) == 1:
+                body = b"ok"
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            # Afterwards the server drops every connection without replying.
+            self.close_connection = len(seen) > 1
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    try:
+        assert reasoning_mod._post(url, b"1", {}, 5.0) == (200, b"ok")
+        # Kept-alive socket fails -> one resend on a fresh connection, whose
+        # failure is final: the request reaches the server twice, not three times.
+        with pytest.raises(ConnectionError):
+            reasoning_mod._post(url, b"2", {}, 5.0)
+        # A brand-new connection is never resent over.
+        with pytest.raises(ConnectionError):
+            reasoning_mod._post(url, b"3", {}, 5.0)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert seen == [b"1", b"2", b"2", b"3"]
+
+
+def test_openai_decide_many_runs_requests_concurrently(fake_openai) -> None:
+    # Every request waits until all three are in flight: passes only if they run concurrently.
+    fake_openai.on_call = threading.Barrier(3, timeout=5).wait
+    fake_openai.reply = '{"leave": false, "confidence_red": 0.1, "public_reason": "再等等", "key_points": []}'
+
+    villagers = [Villager(id=i, eye_color=EyeColor.RED, name=f"红{i}") for i in (1, 2, 3)]
+    for v in villagers:
+        v.observed_red_eyes = 2
+
+    policy = OpenAIReasoningPolicy(style="absolute_rational")
+    assert policy.decide_many(villagers, day=2, public_announcement_made=True) == [False, False, False]
+    assert all(len(v.reasoning_log) == 1 and "对齐标准证明" in v.reasoning_log[0] for v in villagers)
+
+
+def test_openai_decide_many_batches_villagers_into_one_request(fake_openai) -> None:
+    fake_openai.reply = json.dumps(
+        {"answers": [{"leave": False, "confidence_red": 0.1, "public_reason": f"理由{i}"} for i in (1, 2, 3)]},
+        ensure_ascii=False,
+    )
+    villagers = [Villager(id=i, eye_color=EyeColor.RED, name=f"红{i}") for i in (1, 2, 3)]
+    for v in villagers:
+        v.observed_red_eyes = 2
+
+    policy = OpenAIReasoningPolicy(style="rational", batch_size=8)
+    assert policy.decide_many(villagers, day=2, public_announcement_made=True) == [False, False, False]
+    assert fake_openai.calls == 1
+    assert "【村民 3】" in fake_openai.requests[0]["messages"][1]["content"]
+    assert ["理由1" in v.reasoning_log[-1] for v in villagers] == [True, False, False]
+
+    # A reply without one answer per villager falls back to one request each.
+    fake_openai.reply = '{"leave": false, "confidence_red": 0.1, "public_reason": "单独作答"}'
+    assert policy.decide_many(villagers, day=2, public_announcement_made=True) == [False, False, False]
+    assert fake_openai.calls == 1 + 1 + 3
+    assert all("单独作答" in v.reasoning_log[-1] for v in villagers)
+
+    # A failed request is not retried per villager: everyone takes the failure path.
+    def provider_down() -> None:
+        raise RuntimeError("Chat Completions API connection error: refused")
+
+    fake_openai.on_call = provider_down
+    assert policy.decide_many(villagers, day=2, public_announcement_made=True) == [False, False, False]
+    assert fake_openai.calls == 1 + 1 + 3 + 1
+    assert all("refused" in v.reasoning_log[-1] for v in villagers)
+
+
+def test_openai_response_cache_skips_repeat_requests(fake_openai, monkeypatch, tmp_path) -> None:
+    fake_openai.reply = '{"leave": false, "confidence_red": 0.2, "public_reason": "再等等", "key_points": []}'
+    monkeypatch.setenv("OPENAI_CACHE_PATH", str(tmp_path / "responses.sqlite3"))
+
+    policy = OpenAIReasoningPolicy(style="rational")
+    for vid in (1, 2):
+        v = Villager(id=vid, eye_color=EyeColor.RED, name=f"红{vid}")
+        v.observed_red_eyes = 1
+        assert policy.decide(v, day=1, public_announcement_made=True) is False
+    assert fake_openai.calls == 1
+
+    # A fresh process-level cache still hits the SQLite file.
+    reasoning_mod._response_cache.cache_clear()
+    v = Villager(id=3, eye_color=EyeColor.RED, name="红3")
+    v.observed_red_eyes = 1
+    policy.decide(v, day=1, public_announcement_made=True)
+    assert fake_openai.calls == 1
+
+
+def test_openai_policy_loads_dotenv_once(fake_openai, monkeypatch) -> None:
+    loads = {"n": 0}
+
+    def fake_load_dotenv(*args, **kwargs):
+        loads["n"] += 1
+        return False
+
+    monkeypatch.setattr(reasoning_mod, "load_dotenv", fake_load_dotenv)
+    reasoning_mod._load_dotenv_once.cache_clear()
+
+    policy = OpenAIReasoningPolicy(style="rational")
+    for day in (1, 2, 3):
+        v = Villager(id=day, eye_color=EyeColor.BLUE, name=f"蓝{day}")
+        policy.decide(v, day=day, public_announcement_made=True)
+    assert loads["n"] == 1
+    reasoning_mod._load_dotenv_once.cache_clear()
+
+
+def test_simulate_day_consults_openai_villagers_of_a_mixed_village_together(fake_openai) -> None:
+    # Both OpenAI villagers must be in flight at once for the barrier to release.
+    fake_openai.on_call = threading.Barrier(2, timeout=5).wait
+
+    policy = PolicyByVillagerType({"dummy": PerfectInductionPolicy(), "openai": OpenAIReasoningPolicy()})
+    village = create_village(
+        num_red=2,
+        num_blue=2,
+        reasoning_policy=policy,
+        villager_types=["openai", "dummy", "dummy", "openai"],
+    )
+    village.make_announcement()
+
+    assert village.simulate_day() == []
+    assert all(len(v.reasoning_log) == 1 for v in village.villagers)
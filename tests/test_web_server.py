@@ -0,0 +1,63 @@
+import json
+import socket
+import threading
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import src.web_server as web_server
+from src.puzzle import Village
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), web_server.Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _request(httpd, method: str, path: str, body: dict | None = None) -> bytes:
+    conn = HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=5)
+    try:
+        payload = None if body is None else json.dumps(body)
+        conn.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+        return conn.getresponse().read()
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("failure", ["client_gone", "error"])
+def test_interrupted_streamed_run_all_still_publishes_state(server, monkeypatch, failure) -> None:
+    _request(server, "POST", "/api/init", {"numRed": 3, "numBlue": 2, "villagerMode": "all_dummy"})
+    _request(server, "POST", "/api/announce")
+
+    if failure == "client_gone":
+        # The first day's line "fails to send", as if the client dropped the stream.
+        monkeypatch.setattr(web_server.Handler, "_write_ndjson_line", lambda self, data: False)
+    else:
+        simulate_day = Village.simulate_day
+
+        def fail_on_day_two(village):
+            if village.current_day == 1:
+                raise RuntimeError("boom")
+            return simulate_day(village)
+
+        monkeypatch.setattr(Village, "simulate_day", fail_on_day_two)
+
+    _request(server, "POST", "/api/run_all", {"stream": True})
+
+    state = json.loads(_request(server, "GET", "/api/state"))["state"]
+    assert state["currentDay"] == web_server.APP_STATE.village.current_day == 1
+
+
+def test_idle_keep_alive_connection_is_closed(server, monkeypatch) -> None:
+    monkeypatch.setattr(web_server.Handler, "timeout", 0.2)
+    with socket.create_connection(("127.0.0.1", server.server_address[1]), timeout=5) as sock:
+        sock.sendall(b"GET /api/state HTTP/1.1\r\nHost: test\r\n\r\n")
+        received = b""
+        while chunk := sock.recv(65536):  # EOF once the server drops the idle connection
+            received += chunk
+    assert received.startswith(b"HTTP/1.1 200")
@@ -59,6 +59,56 @@ async function apiFetch(path, options) {
   return data;
 }
 
+/**
+ * POST /api/run_all in streaming mode: the server sends one NDJSON line per
+ * simulated day, then the full state, so the UI can render each day as soon
+ * as it is done instead of waiting for the whole run.
+ */
+async function streamRunAll() {
+  const res = await fetch('/api/run_all', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ stream: true }),
+  });
+  if (!res.ok || !res.body) {
+    const data = await res.json().catch(() => null);
+    throw new Error((data && data.error) ? data.error : `HTTP ${res.status}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newline);
+      buffer = buffer.slice(newline + 1);
+      if (line) applyRunAllMessage(JSON.parse(line));
+    }
+  }
+}
+
+function applyRunAllMessage(msg) {
+  if (msg.ok === false) throw new Error(msg.error || '未知错误');
+  if (msg.ok === true) {
+    state = msg.state;
+  } else if (state) {
+    // Per-day delta: {day, left: [ids], logs: [...]}
+    state.currentDay = msg.day;
+    for (const v of state.villagers) {
+      if (msg.left.includes(v.id)) {
+        v.hasLeft = true;
+        v.leftOnDay = msg.day;
+      }
+    }
+    state.dailyLog.push(...msg.logs);
+  }
+  render();
+}
+
 async function refreshState() {
   try {
     const data = await apiFetch('/api/state', { method: 'GET' });
@@ -479,12 +529,7 @@ function wireEvents() {
 
   $('btnRunAll').addEventListener('click', () => {
     if (!state) return;
-    apiFetch('/api/run_all', { method: 'POST', body: '{}' })
-      .then((data) => {
-        state = data.state;
-        render();
-      })
-      .catch((e) => alert(`跑到结束失败：${e.message}`));
+    streamRunAll().catch((e) => alert(`跑到结束失败：${e.message}`));
   });
 
   $('btnReset').addEventListener('click', () => {